@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from reviews.cache import get_cache_version, resource_cache
+
+# Поля, которых хватает правам доступа и вьюхам; остальные (пароль,
+# код подтверждения) в кэш не попадают и подгружаются только по обращению.
+AUTH_USER_FIELDS = (
+    'id', 'username', 'email', 'role', 'is_superuser', 'is_staff',
+    'is_active',
+)
+
+
+def auth_cache():
+    return resource_cache('users')
+
+
+def auth_user_cache_key(user_id):
+    return f'auth-user:{get_cache_version("users")}:{user_id}'
+
+
+def forget_auth_user(user_id):
+    """ Сбрасывает закэшированного пользователя (смена роли, удаление). """
+    auth_cache().delete(auth_user_cache_key(user_id))
+
+
+class VerifiedTokenCache:
+    """
+    LRU уже проверенных токенов в памяти процесса: ключ — SHA-256 сырого
+    токена, запись живёт до `exp` токена. Размер задаёт
+    VERIFIED_TOKEN_CACHE_SIZE; 0 отключает кэш.
+    """
+
+    def __init__(self):
+        self.tokens = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(raw_token):
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        key = self.key(raw_token)
+        with self.lock:
+            entry = self.tokens.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if expires <= time.time():
+                del self.tokens[key]
+                return None
+            self.tokens.move_to_end(key)
+            return token
+
+    def set(self, raw_token, token):
+        size = settings.VERIFIED_TOKEN_CACHE_SIZE
+        if size <= 0:
+            return
+        key = self.key(raw_token)
+        with self.lock:
+            self.tokens[key] = (token, token['exp'])
+            self.tokens.move_to_end(key)
+            while len(self.tokens) > size:
+                self.tokens.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация без запроса пользователя на каждый запрос клиента:
+    нужные поля пользователя берутся из кэша 'auth' на
+    AUTH_USER_CACHE_TIMEOUT секунд. Кэш общий для всех воркеров, иначе
+    сброс записи дошёл бы только до одного из них. Сигналы сбрасывают
+    запись при любом сохранении или удалении пользователя. Подпись
+    и claims повторно присланного токена не проверяются заново, пока
+    он лежит в `verified_tokens`.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = verified_tokens.get(raw_token)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            verified_tokens.set(raw_token, token)
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _('Token contained no recognizable user identification'))
+
+        key = auth_user_cache_key(user_id)
+        values = auth_cache().get(key)
+        if values is None:
+            values = self.user_model.objects.filter(
+                **{api_settings.USER_ID_FIELD: user_id}
+            ).values(*AUTH_USER_FIELDS).first()
+            if values is None:
+                raise AuthenticationFailed(
+                    _('User not found'), code='user_not_found')
+            auth_cache().set(
+                key, values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+
+        # Экземпляр с отложенными остальными полями: save() на нём
+        # записывает только загруженные поля и не затрёт пароль.
+        # from_db ждёт значения в порядке полей модели.
+        fields = [
+            field.attname for field in self.user_model._meta.concrete_fields
+            if field.attname in values
+        ]
+        user = self.user_model.from_db(
+            router.db_for_read(self.user_model), fields,
+            [values[name] for name in fields])
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _('User is inactive'), code='user_inactive')
+        return user
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from reviews.cache import get_cache_version
+
+
+def response_cache_key(resource, request):
+    version = get_cache_version(resource)
+    return f'catalogue:{resource}:{version}:{request.build_absolute_uri()}'
+
+
+def get_cached_response_data(key):
+    return cache.get(key)
+
+
+def set_cached_response_data(key, data):
+    cache.set(key, data, timeout=settings.CATALOGUE_CACHE_TIMEOUT)
@@ -0,0 +1,75 @@
+"""
+Разреженные наборы полей: `?fields=id,name,year` оставляет в ответе только
+перечисленные поля и не загружает из БД то, что для них не нужно.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+
+
+def parse_fields(request, available):
+    """ Запрошенные поля или None, если параметр не передан. """
+    value = request.query_params.get(FIELDS_PARAM)
+    if value is None:
+        return None
+    fields = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = fields - set(available)
+    if not fields or unknown:
+        raise ValidationError({FIELDS_PARAM: [
+            f'Неизвестные поля: {", ".join(sorted(unknown))}. '
+            f'Доступны: {", ".join(available)}.']})
+    return fields
+
+
+def prune_fields(serializer, fields):
+    """ Убирает из сериализатора (или его child при many=True) лишние поля. """
+    target = getattr(serializer, 'child', serializer)
+    for name in set(target.fields) - fields:
+        target.fields.pop(name)
+    return serializer
+
+
+def sparse_queryset(queryset, serializer, fields, extra=()):
+    """
+    Подгоняет queryset под оставшиеся поля сериализатора: only() по
+    колонкам, select_related и prefetch только для запрошенных связей.
+    `extra` — поля модели, которые нужны вьюхе (например, для курсора).
+    Если поле не удаётся сопоставить с моделью (метод, свойство),
+    queryset остаётся как есть — лишняя загрузка лучше лишних запросов.
+    """
+    model = queryset.model
+    only = {model._meta.pk.name, *extra}
+    select, prefetch = [], []
+    for name in fields:
+        field = serializer.fields[name]
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return queryset
+        if model_field.many_to_many or model_field.one_to_many:
+            prefetch.append(model_field.name)
+        elif model_field.many_to_one or model_field.one_to_one:
+            only.add(model_field.name)
+            related = related_columns(field)
+            if related is None:
+                continue
+            select.append(model_field.name)
+            only.update(f'{model_field.name}__{column}' for column in related)
+        else:
+            only.add(model_field.name)
+    return queryset.select_related(None).prefetch_related(None).select_related(
+        *select).prefetch_related(*prefetch).only(*only)
+
+
+def related_columns(field):
+    """
+    Колонки связанной модели, нужные полю: slug для SlugRelatedField,
+    поля вложенного сериализатора; None, если хватает внешнего ключа.
+    """
+    if isinstance(field, serializers.SlugRelatedField):
+        return (field.slug_field,)
+    if isinstance(field, serializers.ModelSerializer):
+        return tuple(field.fields)
+    return None
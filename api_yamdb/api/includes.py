@@ -0,0 +1,70 @@
+"""
+Составные ответы: связанные ресурсы в том же ответе по параметру
+`include` (например, `?include=reviews,reviews.comments`).
+"""
+from django.conf import settings
+from django.db.models import OuterRef, Prefetch, Subquery
+from rest_framework.exceptions import ValidationError
+from reviews.models import Comment, Review
+
+INCLUDE_PARAM = 'include'
+RELATED_ORDERING = ('-pub_date', 'id')
+
+
+def parse_include(request, allowed):
+    """
+    Разбирает список связей через запятую. Вложенная связь включает
+    и родительскую: `reviews.comments` означает и `reviews`.
+    """
+    value = request.query_params.get(INCLUDE_PARAM, '')
+    include = {path.strip() for path in value.split(',') if path.strip()}
+    unknown = include - set(allowed)
+    if unknown:
+        raise ValidationError({INCLUDE_PARAM: [
+            f'Неизвестные связи: {", ".join(sorted(unknown))}. '
+            f'Доступны: {", ".join(allowed)}.']})
+    for path in list(include):
+        parts = path.split('.')
+        include.update('.'.join(parts[:i]) for i in range(1, len(parts)))
+    return include
+
+
+def nested_include(include, relation):
+    """ Связи внутри `relation`: из `reviews.comments` — `comments`. """
+    prefix = f'{relation}.'
+    return {path[len(prefix):] for path in include if path.startswith(prefix)}
+
+
+def limited_prefetch(lookup, queryset, parent_field, limit, to_attr,
+                     ordering=RELATED_ORDERING):
+    """
+    Prefetch не больше `limit` последних объектов на каждого родителя,
+    отсортированных по `ordering`. Отбор делает коррелированный подзапрос
+    с LIMIT внутри того же единственного запроса, поэтому число запросов
+    не зависит от числа родителей.
+    """
+    latest = queryset.model.objects.filter(
+        **{parent_field: OuterRef(parent_field)}
+    ).order_by(*RELATED_ORDERING).values('pk')[:limit]
+    return Prefetch(
+        lookup,
+        queryset=queryset.filter(
+            pk__in=Subquery(latest)).order_by(*ordering),
+        to_attr=to_attr,
+    )
+
+
+def comments_prefetch():
+    return limited_prefetch(
+        'comments', Comment.objects.select_related('author'), 'review',
+        settings.INCLUDED_COMMENTS_PER_REVIEW, 'included_comments')
+
+
+def reviews_prefetch(include):
+    """ Отзывы произведения и, если запрошены, их комментарии. """
+    queryset = Review.objects.select_related('author')
+    if 'comments' in include:
+        queryset = queryset.prefetch_related(comments_prefetch())
+    return limited_prefetch(
+        'reviews', queryset, 'title',
+        settings.INCLUDED_REVIEWS_PER_TITLE, 'included_reviews')
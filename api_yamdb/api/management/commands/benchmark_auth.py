@@ -0,0 +1,63 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import CachedJWTAuthentication, verified_tokens
+from reviews.models import User
+
+ITERATIONS = 10000
+
+
+class Command(BaseCommand):
+    help = ('Measures JWT authentication time per request with and '
+            'without the verified-token cache')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=ITERATIONS,
+            help='Сколько раз аутентифицировать запрос в каждом режиме')
+        parser.add_argument(
+            '--username',
+            help='Чей токен использовать (по умолчанию первый пользователь)')
+
+    def handle(self, *args, **options):
+        """
+        Аутентифицирует один и тот же запрос с одним токеном: так ведут
+        себя активные клиенты API. Пользователь в обоих режимах берётся
+        из кэша, поэтому разница — это разбор и проверка подписи JWT.
+        """
+        users = User.objects.order_by('pk')
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет пользователя для выпуска токена')
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        iterations = options['iterations']
+        results = {}
+        modes = (
+            ('без кэша токенов', 0),
+            ('с кэшем токенов', settings.VERIFIED_TOKEN_CACHE_SIZE or 1),
+        )
+        for label, size in modes:
+            with override_settings(VERIFIED_TOKEN_CACHE_SIZE=size):
+                results[label] = self.measure(request, iterations)
+            self.stdout.write(
+                f'{label}: {results[label] * 1e6:.1f} мкс на запрос')
+        off, on = results.values()
+        self.stdout.write(f'Ускорение: {off / on:.1f}×')
+
+    def measure(self, request, iterations):
+        authenticator = CachedJWTAuthentication()
+        verified_tokens.clear()
+        # Первый вызов прогревает кэш пользователя (и токена, если он есть).
+        authenticator.authenticate(request)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            authenticator.authenticate(request)
+        return (time.perf_counter() - started) / iterations
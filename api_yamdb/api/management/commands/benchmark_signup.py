@@ -0,0 +1,77 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from api.views import UserRegistrationView
+from reviews.models import User
+
+SIGNUPS = 1000
+THREADS = 8
+PREFIX = 'benchmark_signup_'
+
+
+def signup(view, data):
+    """ Регистрация через вьюху в обход middleware; статус ответа. """
+    request = APIRequestFactory().post(
+        '/api/v1/auth/signup/', data, format='json')
+    try:
+        return view(request).status_code
+    except DatabaseError as error:
+        # Например, «database is locked» на SQLite под нагрузкой.
+        return type(error).__name__
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Measures signup throughput under concurrent requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--signups', type=int, default=SIGNUPS,
+            help='Сколько запросов на регистрацию отправить')
+        parser.add_argument(
+            '--threads', type=int, default=THREADS,
+            help='Сколько запросов выполнять одновременно')
+        parser.add_argument(
+            '--unique', type=int,
+            help='Сколько разных пользователей регистрировать (по умолчанию '
+                 'все разные; меньшее число даёт повторы и гонки)')
+
+    def handle(self, *args, **options):
+        """
+        Регистрирует пользователей с префиксом в имени и удаляет их в
+        конце. Письма не отправляются: почта подменена на dummy-бэкенд.
+        """
+        unique = options['unique'] or options['signups']
+        payloads = [
+            {'username': f'{PREFIX}{number % unique}',
+             'email': f'{PREFIX}{number % unique}@example.com'}
+            for number in range(options['signups'])
+        ]
+        view = UserRegistrationView.as_view()
+        User.objects.filter(username__startswith=PREFIX).delete()
+        dummy_mail = 'django.core.mail.backends.dummy.EmailBackend'
+        try:
+            with override_settings(EMAIL_BACKEND=dummy_mail,
+                                   EMAIL_OUTBOX=False):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(options['threads']) as executor:
+                    statuses = Counter(executor.map(
+                        lambda data: signup(view, data), payloads))
+                elapsed = time.perf_counter() - started
+            created = User.objects.filter(username__startswith=PREFIX).count()
+        finally:
+            User.objects.filter(username__startswith=PREFIX).delete()
+        self.stdout.write(
+            f'{len(payloads)} регистраций за {elapsed:.2f} с: '
+            f'{len(payloads) / elapsed:.0f} в секунду')
+        self.stdout.write('Статусы: ' + ', '.join(
+            f'{code} × {count}'
+            for code, count in sorted(statuses.items(), key=str)))
+        self.stdout.write(f'Создано пользователей: {created} из {unique}')
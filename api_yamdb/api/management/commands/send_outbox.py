@@ -0,0 +1,102 @@
+import datetime as dt
+import time
+import uuid
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from reviews.models import OutboxEmail
+
+INTERVAL = 5
+
+
+def retry_delay(attempts):
+    """ Пауза перед следующей попыткой: растёт вдвое после каждой ошибки. """
+    return dt.timedelta(
+        seconds=settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_batch(batch_size):
+    """
+    Берёт в аренду пачку готовых писем одним условным UPDATE: строку,
+    которую успел взять другой воркер, условие по next_attempt уже не
+    пропустит. Так работает и на SQLite, где SELECT FOR UPDATE нет.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    ready = OutboxEmail.objects.filter(
+        attempts__lt=settings.EMAIL_OUTBOX_MAX_ATTEMPTS,
+        next_attempt__lte=now)
+    ids = list(ready.order_by('next_attempt', 'id').values_list(
+        'pk', flat=True)[:batch_size])
+    ready.filter(pk__in=ids).update(
+        claimed_by=token,
+        next_attempt=now + dt.timedelta(
+            seconds=settings.EMAIL_OUTBOX_LEASE))
+    return list(OutboxEmail.objects.filter(claimed_by=token).order_by('id'))
+
+
+def drain_batch(mail_connection, batch_size):
+    """
+    Отправляет пачку писем через одно соединение. Письма отправляются
+    вне транзакции: открытая транзакция на SQLite не дала бы
+    регистрациям писать в БД, пока идёт разговор с почтовым сервером.
+    Итог пишется второй короткой транзакцией. Если воркер упадёт между
+    отправкой и записью итога, письмо уйдёт повторно после аренды.
+    Возвращает число отправленных и неудачных писем.
+    """
+    sent, failed = [], []
+    for email in claim_batch(batch_size):
+        message = EmailMessage(
+            email.subject, email.body, email.from_email, [email.to],
+            connection=mail_connection)
+        try:
+            mail_connection.open()
+            message.send()
+        except Exception as error:
+            # После ошибки соединение может быть испорчено:
+            # следующее письмо откроет новое.
+            mail_connection.close()
+            email.attempts += 1
+            email.last_error = repr(error)
+            email.next_attempt = timezone.now() + retry_delay(email.attempts)
+            email.claimed_by = ''
+            failed.append(email)
+        else:
+            sent.append(email.pk)
+    with transaction.atomic():
+        OutboxEmail.objects.filter(pk__in=sent).delete()
+        OutboxEmail.objects.bulk_update(
+            failed, ('attempts', 'last_error', 'next_attempt', 'claimed_by'))
+    return len(sent), len(failed)
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails from the outbox table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help='Сколько писем отправлять в одной транзакции')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Не завершаться, а ждать новые письма')
+        parser.add_argument(
+            '--interval', type=float, default=INTERVAL,
+            help='Сколько секунд ждать, когда отправлять нечего (с --loop)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        with get_connection() as mail_connection:
+            while True:
+                sent, failed = drain_batch(mail_connection, batch_size)
+                if sent or failed:
+                    self.stdout.write(
+                        f'Отправлено писем: {sent}, с ошибкой: {failed}')
+                if sent + failed < batch_size:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['interval'])
@@ -1,4 +1,19 @@
+import hashlib
+
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from rest_framework import viewsets, mixins
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from reviews.leaderboards import get_leaderboard
+from reviews.models import Title
+
+from .cache import (get_cached_response_data, response_cache_key,
+                    set_cached_response_data)
+from .fieldsets import parse_fields, prune_fields, sparse_queryset
+from .includes import INCLUDE_PARAM, parse_include
 
 
 class CreateListDestroyViewSet(
@@ -8,3 +23,160 @@ class CreateListDestroyViewSet(
     viewsets.GenericViewSet
 ):
     pass
+
+
+class CachedListMixin:
+    """
+    Кэширует ответы list по полному URL запроса.
+    Ключ включает версию ресурса `cache_resource`, которую повышают
+    сигналы при любых изменениях связанных моделей.
+    """
+    cache_resource = None
+    # Параметры, с которыми ответ зависит от чего-то кроме cache_resource.
+    uncached_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def cached_response(self, view, request, *args, **kwargs):
+        if any(param in request.query_params
+               for param in self.uncached_params):
+            return view(request, *args, **kwargs)
+        key = response_cache_key(self.cache_resource, request)
+        data = get_cached_response_data(key)
+        if data is not None:
+            return Response(data)
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            set_cached_response_data(key, response.data)
+        return response
+
+
+class CachedListRetrieveMixin(CachedListMixin):
+    """ Кэширует ответы list и retrieve. """
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+
+class SparseFieldsetMixin:
+    """
+    `?fields=` для list и retrieve: ответ содержит только перечисленные
+    поля сериализатора, а queryset не грузит колонки, JOIN и prefetch
+    для остальных. Вьюсеты со своим get_queryset вызывают
+    `with_sparse_fields` сами.
+    """
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            if self.action in ('list', 'retrieve'):
+                self._sparse_fields = parse_fields(
+                    self.request, list(self.get_serializer_class()().fields))
+        return self._sparse_fields
+
+    def with_sparse_fields(self, queryset):
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        ordering = [
+            name.lstrip('-') for name in getattr(self, 'keyset_ordering', ())]
+        return sparse_queryset(
+            queryset, self.get_serializer_class()(), fields, extra=ordering)
+
+    def get_queryset(self):
+        return self.with_sparse_fields(super().get_queryset())
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return serializer
+        return prune_fields(serializer, fields)
+
+
+class IncludeMixin:
+    """
+    Разбирает `?include=` для list и retrieve и передаёт его
+    сериализатору; вьюсет добавляет нужные prefetch в `with_included`.
+    """
+    include_allowed = ()
+
+    def get_include(self):
+        if not hasattr(self, '_include'):
+            self._include = (
+                parse_include(self.request, self.include_allowed)
+                if self.action in ('list', 'retrieve') else set()
+            )
+        return self._include
+
+    def with_included(self, queryset):
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[INCLUDE_PARAM] = self.get_include()
+        return context
+
+
+class LeaderboardMixin:
+    """
+    Маршрут `<slug>/top/` с лидербордом категории или жанра: готовый
+    список из кэша, без агрегации по отзывам на каждый запрос.
+    """
+    leaderboard_kind = None
+
+    @action(detail=True)
+    def top(self, request, slug=None):
+        entries = get_leaderboard(self.leaderboard_kind, slug)
+        if not entries:
+            get_object_or_404(self.get_queryset(), slug=slug)
+        return Response(entries)
+
+
+class TitleConditionalGetMixin:
+    """
+    ETag и Last-Modified по дате изменения произведения из URL.
+    Дата обновляется при любых изменениях произведения, его отзывов
+    и комментариев, поэтому неизменившийся ответ стоит одного
+    запроса по первичному ключу и отдаётся как 304 без сериализации.
+    """
+    title_url_kwarg = 'title_id'
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_title_modified(self):
+        title_id = self.kwargs.get(self.title_url_kwarg)
+        if title_id is None:
+            return None
+        try:
+            return Title.objects.filter(pk=title_id).values_list(
+                'modified', flat=True).first()
+        except (TypeError, ValueError):
+            # Нечисловой id: 404, как у get_object_or_404 из DRF.
+            raise NotFound
+
+    def conditional_response(self, view, request, *args, **kwargs):
+        modified = self.get_title_modified()
+        if modified is None:
+            return view(request, *args, **kwargs)
+
+        etag = quote_etag(hashlib.md5(
+            f'{modified.isoformat()}:{request.accepted_media_type}'.encode()
+        ).hexdigest())
+        last_modified = int(modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+        return response
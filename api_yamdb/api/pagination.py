@@ -0,0 +1,151 @@
+import json
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Keyset-пагинация по составному ключу сортировки вьюсета.
+    Позиция курсора хранит значения всех полей ключа, поэтому страница
+    на любой глубине выбирается одним запросом без COUNT и OFFSET.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        return view.keyset_ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+        position = self.decode_position(self.cursor, queryset.model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position, reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_following = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        cursor = Cursor(
+            offset=0, reverse=False, position=self.position(self.page[-1]))
+        return self.encode_cursor(cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        cursor = Cursor(
+            offset=0, reverse=True, position=self.position(self.page[0]))
+        return self.encode_cursor(cursor)
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def position(self, instance):
+        """ Упаковывает значения полей ключа объекта в позицию курсора. """
+        values = [
+            attrgetter(field.lstrip('-'))(instance) for field in self.ordering
+        ]
+        return json.dumps(values, default=str)
+
+    def decode_position(self, cursor, model):
+        """
+        Значения позиции, приведённые к типам полей ключа: курсор приходит
+        от клиента, и строка вместо года или даты не должна дойти до БД.
+        """
+        if cursor is None or cursor.position is None:
+            return None
+        try:
+            values = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            return [
+                self.ordering_field(model, field).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def ordering_field(model, field):
+        """ Поле модели по имени из ключа сортировки, в том числе через __. """
+        *relations, name = field.lstrip('-').split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(name)
+
+    def keyset_filter(self, position, reverse):
+        """
+        Условие «строго после позиции» для составного ключа:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            descending = field.startswith('-') != reverse
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """
+    По умолчанию — обычная постраничная пагинация.
+    Если в запросе есть параметр `cursor` (в том числе пустой),
+    включается keyset-пагинация по `keyset_ordering` вьюсета.
+    Параметры из `keyset_excluded_params` вьюсета задают свой порядок
+    (например, релевантность поиска), и курсор вместе с ними не принимается.
+    """
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        cursor_param = self.keyset_class.cursor_query_param
+        if (
+            view is not None
+            and getattr(view, 'keyset_ordering', None)
+            and cursor_param in request.query_params
+        ):
+            excluded = [
+                param for param in getattr(view, 'keyset_excluded_params', ())
+                if param in request.query_params
+            ]
+            if excluded:
+                raise ValidationError({cursor_param: [
+                    f'Курсор нельзя сочетать с {", ".join(excluded)}: '
+                    'используйте постраничную пагинацию.']})
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
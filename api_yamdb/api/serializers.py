@@ -1,13 +1,15 @@
 import datetime as dt
-import uuid
 
-from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from reviews.models import Category, Genre, Title, Review, Comment, User
-from .utils import send_confirm_mail
+from reviews.models import (SCORES, Category, Genre, Title, Review, Comment,
+                            User, score_field)
+from .includes import nested_include
+from .utils import (new_confirmation_nonce, rotate_confirmation_code,
+                    send_confirm_mail)
 from .validators import MeNameNotInUsername
 
 
@@ -36,7 +38,7 @@ class TitleWriteSerializer(serializers.ModelSerializer):
         queryset=Genre.objects.all(),
         many=True
     )
-    rating = serializers.SerializerMethodField()
+    rating = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Title
@@ -53,34 +55,44 @@ class TitleWriteSerializer(serializers.ModelSerializer):
             )
         return value
 
-    def get_rating(self, obj):
-        """ Рассчитывает усреднённый рейтинг по оценкам произведения. """
-        reviews = Review.objects.filter(title=obj.pk)
-        if not reviews.exists():
-            return None
-        average = reviews.aggregate(avg_rating=models.Avg('score'))
-        return int(round(average['avg_rating']))
-
 
 class TitleReadSerializer(serializers.ModelSerializer):
     """ Сериализатор для GET-запросов произведений. """
     category = CategorySerializer()
     genre = GenreSerializer(many=True)
-    rating = serializers.SerializerMethodField()
+    rating = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Title
         fields = (
-            'id', 'name', 'year', 'rating',
+            'id', 'name', 'year', 'rating', 'reviews_count',
             'description', 'genre', 'category',)
 
-    def get_rating(self, obj):
-        """ Рассчитывает усреднённый рейтинг по оценкам произведения. """
-        reviews = Review.objects.filter(title=obj.pk)
-        if not reviews.exists():
-            return None
-        average = reviews.aggregate(avg_rating=models.Avg('score'))
-        return int(round(average['avg_rating']))
+    def to_representation(self, instance):
+        """ С `?include=reviews` добавляет последние отзывы произведения. """
+        data = super().to_representation(instance)
+        include = self.context.get('include', ())
+        if 'reviews' in include:
+            data['reviews'] = ReviewSerializer(
+                instance.included_reviews, many=True,
+                context={**self.context,
+                         'include': nested_include(include, 'reviews')},
+            ).data
+        return data
+
+
+class TitleStatsSerializer(serializers.ModelSerializer):
+    """ Рейтинг и гистограмма оценок произведения. """
+    rating = serializers.IntegerField(read_only=True)
+    scores = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Title
+        fields = ('id', 'rating', 'score_count', 'scores')
+
+    def get_scores(self, obj):
+        return {str(score): getattr(obj, score_field(score))
+                for score in SCORES}
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -91,18 +103,30 @@ class ReviewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Review
-        fields = ('id', 'text', 'author', 'score', 'pub_date')
-
-    def validate(self, data):
-        title = self.context['request'].parser_context['kwargs']['title_id']
-        duplicate = Review.objects.filter(
-            author=self.context['request'].user,
-            title=title)
-        if self.context['request'].method != 'PATCH' and duplicate.exists():
-            raise ValidationError('Уже оставляли отзыв на это произведение.')
+        fields = (
+            'id', 'text', 'author', 'score', 'pub_date', 'comments_count')
+
+    def to_representation(self, instance):
+        """ С `?include=comments` добавляет последние комментарии. """
+        data = super().to_representation(instance)
+        if 'comments' in self.context.get('include', ()):
+            data['comments'] = CommentSerializer(
+                instance.included_comments, many=True).data
         return data
 
 
+class ReviewBatchItemSerializer(serializers.ModelSerializer):
+    """
+    Отзыв из пакетной отправки. Произведение передаётся числом и
+    проверяется вьюхой сразу для всего пакета, а не запросом на отзыв.
+    """
+    title = serializers.IntegerField(source='title_id', min_value=1)
+
+    class Meta:
+        model = Review
+        fields = ('title', 'text', 'score')
+
+
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True, slug_field='username',
@@ -114,39 +138,83 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'text', 'author', 'pub_date')
 
 
+class TitleExportSerializer(TitleReadSerializer):
+    """
+    Произведение для NDJSON-выгрузки каталога. Отзывы вьюха дописывает
+    в строку сама, читая их кусками.
+    """
+
+    class Meta(TitleReadSerializer.Meta):
+        fields = TitleReadSerializer.Meta.fields + ('modified',)
+
+
 class UserRegistrationSerializer(serializers.Serializer):
+    """
+    Регистрация и повторный запрос кода. Существующий пользователь ищется
+    одним запросом по username или email; уникальность гарантируют
+    ограничения БД, а не проверки перед вставкой, поэтому одновременные
+    регистрации с одинаковыми данными не создадут дубликат.
+    """
     username = serializers.CharField(
         max_length=150,
         required=True,
-        validators=[
-            UniqueValidator(queryset=User.objects.all()),
-            MeNameNotInUsername()
-        ]
+        validators=[MeNameNotInUsername()]
     )
     email = serializers.EmailField(
         max_length=254,
         required=True,
-        validators=[UniqueValidator(queryset=User.objects.all())]
     )
 
-    def create(self, validated_data):
-        email = validated_data.get('email')
-        username = validated_data.get('username')
-
-        if not User.objects.filter(email=email).exists():
-            validated_data['confirmation_code'] = str(uuid.uuid4())
-            user = User.objects.create(**validated_data)
-        else:
-            user = User.objects.get(email=email)
-            if user.username != username:
+    def validate(self, data):
+        self.existing_user = self.registered_user(data)
+        return data
+
+    @staticmethod
+    def registered_user(data):
+        """
+        Пользователь ровно с этими username и email (повторный запрос кода)
+        или None. Если занято только одно из полей — ошибка валидации.
+        """
+        users = User.objects.filter(
+            Q(username=data['username']) | Q(email=data['email'])
+        ).only('pk', 'username', 'email', 'confirmation_code')[:2]
+        existing = None
+        for user in users:
+            if (user.username, user.email) == (
+                    data['username'], data['email']):
+                existing = user
+            elif user.username == data['username']:
                 raise serializers.ValidationError(
-                    (
-                        f'Аккаунт с {email} уже зарегистрирован. '
-                        'Пожалуйста используйте корректный username.'
-                    )
-                )
-            user.save()
-        send_confirm_mail(user)
+                    {'username': ['Это имя пользователя уже занято.']})
+            else:
+                raise serializers.ValidationError({'email': [
+                    f'Аккаунт с {data["email"]} уже зарегистрирован. '
+                    'Пожалуйста используйте корректный username.']})
+        return existing
+
+    def create(self, validated_data):
+        user = self.existing_user
+        if user is None:
+            try:
+                with transaction.atomic():
+                    user = User.objects.create(
+                        **validated_data,
+                        confirmation_code=new_confirmation_nonce())
+                    send_confirm_mail(user)
+                return user
+            except IntegrityError:
+                # Параллельный запрос успел занять username или email.
+                # Если он регистрировал ту же пару, это повторный запрос кода.
+                user = self.registered_user(validated_data)
+                if user is None:
+                    raise serializers.ValidationError(
+                        'Пользователь с таким username или email '
+                        'уже существует.')
+        with transaction.atomic():
+            if not user.confirmation_code:
+                # Пользователь заведён админом и кода ещё не получал.
+                rotate_confirmation_code(user)
+            send_confirm_mail(user)
         return user
 
 
@@ -0,0 +1,65 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save)
+from django.dispatch import receiver
+
+from reviews.cache import CATALOGUE_RESOURCES, bump_cache_version
+from reviews.models import Category, Genre, GenreTitle, Review, Title, User
+
+from .authentication import forget_auth_user
+
+# Оценки в лидербордах обновляет сам пересчёт рейтинга, поэтому отзывы
+# их версию не повышают.
+CACHE_DEPENDENCIES = {
+    Category: ('categories', 'titles', 'leaderboards'),
+    Genre: ('genres', 'titles', 'leaderboards'),
+    Title: ('titles', 'leaderboards'),
+    GenreTitle: ('titles', 'leaderboards'),
+    Review: ('titles',),
+}
+
+
+def bump_on_commit(*resources, using=None):
+    """
+    Повышает версии после коммита. Если повысить их внутри транзакции,
+    параллельный GET положит в кэш под новой версией незакоммиченные
+    данные или данные до пересчёта рейтинга (receivers reviews идут
+    после api) и будет отдавать их до истечения TTL.
+    """
+    transaction.on_commit(partial(bump_cache_version, *resources), using=using)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def catalogue_changed(sender, using=None, **kwargs):
+    """ Сбрасывает кэш ответов, зависящих от изменённой модели. """
+    resources = CACHE_DEPENDENCIES.get(sender)
+    if resources:
+        bump_on_commit(*resources, using=using)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, action, using=None, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_on_commit('titles', 'leaderboards', using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, using=None, **kwargs):
+    """
+    Роль, активность или само существование пользователя изменились.
+    Запись сбрасывается и сразу, и после коммита: запрос, пришедший
+    до коммита, успеет закэшировать старую строку.
+    """
+    forget_auth_user(instance.pk)
+    transaction.on_commit(partial(forget_auth_user, instance.pk), using=using)
+
+
+@receiver(post_migrate)
+def database_reset(sender, using=None, **kwargs):
+    """ После migrate/flush данные в БД другие — сбрасываем весь кэш. """
+    if sender.name == 'api':
+        bump_on_commit(*CATALOGUE_RESOURCES, 'users', using=using)
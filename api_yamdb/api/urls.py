@@ -5,6 +5,7 @@ from .views import (
     CategoryViewSet,
     CommentViewSet,
     GenreViewSet,
+    ReviewBatchView,
     ReviewViewSet,
     TitleViewSet,
     UserRegistrationView,
@@ -35,5 +36,9 @@ urlpatterns = [
         'v1/users/me/',
         UserSettingsView.as_view(),
         name='token_refresh'),
+    path(
+        'v1/reviews/batch/',
+        ReviewBatchView.as_view(),
+        name='reviews_batch'),
     path('v1/', include(router.urls)),
 ]
@@ -1,6 +1,15 @@
+import uuid
+from functools import partial
+
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.conf import settings
+from django.core import signing
 from django.core.mail import send_mail
+from django.db import transaction
+
+from reviews.models import OutboxEmail, User
+
+CONFIRMATION_CODE_SALT = 'api.confirmation-code'
 
 
 def get_tokens_for_user(user):
@@ -11,11 +20,76 @@ def get_tokens_for_user(user):
     }
 
 
+def new_confirmation_nonce():
+    return str(uuid.uuid4())
+
+
+def confirmation_value(user):
+    return f'{user.pk}:{user.confirmation_code}'
+
+
+def make_confirmation_code(user):
+    """
+    Код для письма. При SIGNED_CONFIRMATION_CODES это HMAC с меткой
+    времени над id пользователя и одноразовым значением из
+    confirmation_code, а не само значение: повторный запрос кода
+    ничего не пишет в БД.
+    """
+    if not settings.SIGNED_CONFIRMATION_CODES:
+        return user.confirmation_code
+    value = confirmation_value(user)
+    signed = signing.TimestampSigner(salt=CONFIRMATION_CODE_SALT).sign(value)
+    return signed[len(value) + 1:]
+
+
+def check_confirmation_code(user, code):
+    """ Проверяет код без обращения к БД. """
+    if not settings.SIGNED_CONFIRMATION_CODES:
+        return user.confirmation_code == code
+    if not isinstance(code, str):
+        return False
+    try:
+        signing.TimestampSigner(salt=CONFIRMATION_CODE_SALT).unsign(
+            f'{confirmation_value(user)}:{code}',
+            max_age=settings.CONFIRMATION_CODE_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def rotate_confirmation_code(user):
+    """
+    Делает код одноразовым, обновляя одну колонку. Условие на старое
+    значение не даёт обменять один код на токен дважды параллельными
+    запросами: проигравший получает False.
+    """
+    nonce = new_confirmation_nonce()
+    updated = User.objects.filter(
+        pk=user.pk, confirmation_code=user.confirmation_code,
+    ).update(confirmation_code=nonce)
+    user.confirmation_code = nonce
+    return bool(updated)
+
+
 def send_confirm_mail(user):
-    send_mail(
-        'Yamdb. Код подтверждения.',
-        f'{user.confirmation_code}',
+    """
+    При EMAIL_OUTBOX письмо кладётся в таблицу исходящих в текущей
+    транзакции и уходит командой send_outbox. Иначе оно отправляется
+    после коммита: держать транзакцию (на SQLite — блокировку записи
+    всей БД) открытой на время разговора с почтовым сервером нельзя.
+    """
+    subject = 'Yamdb. Код подтверждения.'
+    body = make_confirmation_code(user)
+    if settings.EMAIL_OUTBOX:
+        OutboxEmail.objects.create(
+            subject=subject, body=body,
+            from_email=settings.DEFAULT_FROM_EMAIL, to=user.email)
+        return
+    transaction.on_commit(partial(
+        send_mail,
+        subject,
+        body,
         settings.DEFAULT_FROM_EMAIL,
         [user.email],
         fail_silently=False,
-    )
+    ))
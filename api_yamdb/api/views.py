@@ -1,20 +1,47 @@
-import uuid
-
+import datetime as dt
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters import rest_framework as dfilters
-from rest_framework import filters, permissions, status, views, viewsets
+from rest_framework import (filters, generics, permissions, status, views,
+                            viewsets)
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from reviews.models import Category, Genre, Review, Title, User
-
-from api.mixins import CreateListDestroyViewSet
+from reviews.cache import bump_cache_version
+from reviews.models import (SCORES, Category, Genre, Review, Title, User,
+                            score_field)
+from reviews.search import (TITLE_FTS_TABLE, title_match_query,
+                            title_search_available)
+from reviews.utils import add_review_scores
+
+from api.includes import (INCLUDE_PARAM, comments_prefetch, nested_include,
+                          reviews_prefetch)
+from api.mixins import (CachedListMixin, CachedListRetrieveMixin,
+                        CreateListDestroyViewSet, IncludeMixin,
+                        LeaderboardMixin, SparseFieldsetMixin,
+                        TitleConditionalGetMixin)
+from api.pagination import PageNumberOrKeysetPagination
 from api.permissions import (AuthorModAdminOrReadOnly,
                              SuperuserAdminOrReadOnly, SuperuserOrAdminOnly)
 from api.serializers import (CategorySerializer, CommentSerializer,
-                             GenreSerializer, ReviewSerializer,
-                             TitleReadSerializer, TitleWriteSerializer,
+                             GenreSerializer, ReviewBatchItemSerializer,
+                             ReviewSerializer,
+                             TitleExportSerializer, TitleReadSerializer,
+                             TitleStatsSerializer, TitleWriteSerializer,
                              UserOwnSettingsSerializer,
                              UserRegistrationSerializer, UserSerializer)
-from api.utils import get_tokens_for_user
+from api.utils import (check_confirmation_code, get_tokens_for_user,
+                       rotate_confirmation_code)
+
+EXPORT_WATERMARK_HEADER = 'X-Export-Watermark'
 
 
 class TitleFilter(dfilters.FilterSet):
@@ -22,14 +49,47 @@ class TitleFilter(dfilters.FilterSet):
     genre = dfilters.CharFilter(field_name='genre__slug')
     category = dfilters.CharFilter(field_name='category__slug')
     name = dfilters.CharFilter(field_name='name', lookup_expr='icontains')
+    search = dfilters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
-        fields = ('category', 'genre', 'name', 'year',)
-
-
-class CategoryViewSet(CreateListDestroyViewSet):
+        fields = ('category', 'genre', 'name', 'year', 'search',)
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию через FTS5-индекс,
+        результаты отсортированы по релевантности. Запрос без единого
+        слова (только знаки препинания) ничего не находит.
+        """
+        if not title_search_available(queryset.db):
+            return queryset.filter(
+                Q(name__icontains=value) | Q(description__icontains=value))
+        match = title_match_query(value)
+        if match is None:
+            return queryset.none()
+        title_table = Title._meta.db_table
+        return queryset.extra(
+            where=[
+                f'{title_table}.id IN (SELECT rowid FROM {TITLE_FTS_TABLE} '
+                f'WHERE {TITLE_FTS_TABLE} MATCH %s)'
+            ],
+            params=[match],
+        ).annotate(
+            search_rank=RawSQL(
+                f'SELECT rank FROM {TITLE_FTS_TABLE} '
+                f'WHERE {TITLE_FTS_TABLE} MATCH %s '
+                f'AND rowid = {title_table}.id',
+                (match,))
+        ).order_by('search_rank', 'id')
+
+
+class CategoryViewSet(
+    SparseFieldsetMixin, LeaderboardMixin, CachedListMixin,
+    CreateListDestroyViewSet
+):
     """ Вьюсет для категорий произведений. """
+    cache_resource = 'categories'
+    leaderboard_kind = 'category'
     queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
     permission_classes = (SuperuserAdminOrReadOnly,)
@@ -38,8 +98,13 @@ class CategoryViewSet(CreateListDestroyViewSet):
     lookup_field = 'slug'
 
 
-class GenreViewSet(CreateListDestroyViewSet):
+class GenreViewSet(
+    SparseFieldsetMixin, LeaderboardMixin, CachedListMixin,
+    CreateListDestroyViewSet
+):
     """ Вьюсет для жанров произведений. """
+    cache_resource = 'genres'
+    leaderboard_kind = 'genre'
     queryset = Genre.objects.all().order_by('name')
     serializer_class = GenreSerializer
     permission_classes = (SuperuserAdminOrReadOnly,)
@@ -48,49 +113,347 @@ class GenreViewSet(CreateListDestroyViewSet):
     lookup_field = 'slug'
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(
+    IncludeMixin, SparseFieldsetMixin, TitleConditionalGetMixin,
+    CachedListRetrieveMixin, viewsets.ModelViewSet
+):
     """ Вьюсет для художественных произведений. """
-    queryset = Title.objects.all().order_by('-year')
+    title_url_kwarg = 'pk'
+    cache_resource = 'titles'
+    # Комментарии не меняют версию кэша произведений, поэтому составные
+    # ответы не кэшируются; детальный ответ всё равно получает ETag.
+    uncached_params = (INCLUDE_PARAM,)
+    include_allowed = ('reviews', 'reviews.comments')
+    keyset_ordering = ('-year', 'id')
+    # Поиск сортирует по релевантности, которой нет в ключе курсора.
+    keyset_excluded_params = ('search',)
+    queryset = Title.objects.select_related('category').prefetch_related(
+        'genre').order_by(*keyset_ordering)
     permission_classes = (SuperuserAdminOrReadOnly,)
+    pagination_class = PageNumberOrKeysetPagination
     filter_backends = (dfilters.DjangoFilterBackend,)
     filterset_class = TitleFilter
 
+    export_chunk_size = 200
+    export_reviews_chunk_size = 1000
+
+    def get_queryset(self):
+        return self.with_included(super().get_queryset())
+
+    def with_included(self, queryset):
+        include = self.get_include()
+        if 'reviews' in include:
+            queryset = queryset.prefetch_related(reviews_prefetch(
+                nested_include(include, 'reviews')))
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return TitleWriteSerializer
         return TitleReadSerializer
 
-
-class ReviewViewSet(viewsets.ModelViewSet):
+    @action(
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=None,
+    )
+    def export(self, request):
+        """
+        Потоковая NDJSON-выгрузка каталога: по произведению с жанрами,
+        категорией, рейтингом и всеми отзывами на строку.
+
+        Куски читаются отдельными запросами без общего снимка, поэтому
+        до чтения фиксируется метка времени и отдаётся в заголовке
+        EXPORT_WATERMARK_HEADER. Следующую выгрузку запрашивают с
+        `since` = этой метке: фильтр `modified >= since` вернёт всё, что
+        изменилось во время текущей выгрузки, возможно повторно — строки
+        применяются по id. Удаления в выгрузке не отражаются.
+        """
+        watermark = timezone.now()
+        queryset = Title.objects.select_related('category').prefetch_related(
+            'genre').order_by('id')
+        since = request.query_params.get('since')
+        if since:
+            queryset = queryset.filter(modified__gte=self.parse_since(since))
+        response = StreamingHttpResponse(
+            self.export_lines(queryset),
+            content_type='application/x-ndjson; charset=utf-8',
+        )
+        response[EXPORT_WATERMARK_HEADER] = watermark.isoformat()
+        return response
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        """
+        Гистограмма оценок 1–10: счётчики хранятся в самом произведении
+        и обновляются вместе с рейтингом, GROUP BY по отзывам не нужен.
+        """
+        title = generics.get_object_or_404(
+            Title.objects.only(
+                'id', 'rating', 'score_count',
+                *(score_field(score) for score in SCORES)),
+            pk=pk)
+        return Response(TitleStatsSerializer(title).data)
+
+    @staticmethod
+    def parse_since(value):
+        moment = parse_datetime(value)
+        if moment is None:
+            date = parse_date(value)
+            if date is None:
+                raise ValidationError(
+                    {'since': 'Ожидается дата или дата и время в ISO 8601.'})
+            moment = dt.datetime.combine(date, dt.time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment, timezone.utc)
+        return moment
+
+    def export_lines(self, queryset):
+        """
+        Идёт по произведениям кусками по первичному ключу, а по их
+        отзывам — кусками по ключу (title_id, pub_date, id). Массив
+        reviews пишется в строку по мере чтения, поэтому в памяти не
+        больше куска произведений и куска отзывов, сколько бы отзывов
+        ни было у произведения.
+        """
+        last_id = 0
+        while True:
+            chunk = list(
+                queryset.filter(pk__gt=last_id)[:self.export_chunk_size])
+            if not chunk:
+                return
+            reviews = self.export_reviews([title.pk for title in chunk])
+            review = next(reviews, None)
+            for title in chunk:
+                data = json.dumps(
+                    TitleExportSerializer(title).data, ensure_ascii=False)
+                yield data[:-1] + ', "reviews": ['
+                separator = ''
+                while review is not None and review.title_id == title.pk:
+                    yield separator + json.dumps(
+                        ReviewSerializer(review).data, ensure_ascii=False)
+                    separator = ', '
+                    review = next(reviews, None)
+                yield ']}\n'
+            last_id = chunk[-1].pk
+
+    def export_reviews(self, title_ids):
+        """ Отзывы произведений куска в порядке выгрузки, кусками. """
+        queryset = Review.objects.filter(
+            title_id__in=title_ids
+        ).select_related('author').only(
+            'id', 'title', 'text', 'score', 'pub_date', 'comments_count',
+            'author__username',
+        ).order_by('title_id', 'pub_date', 'id')
+        last = None
+        while True:
+            page = queryset
+            if last is not None:
+                page = page.filter(
+                    Q(title_id__gt=last.title_id)
+                    | Q(title_id=last.title_id, pub_date__gt=last.pub_date)
+                    | Q(title_id=last.title_id, pub_date=last.pub_date,
+                        id__gt=last.pk))
+            chunk = list(page[:self.export_reviews_chunk_size])
+            if not chunk:
+                return
+            yield from chunk
+            last = chunk[-1]
+
+
+class ReviewViewSet(
+    IncludeMixin, SparseFieldsetMixin, TitleConditionalGetMixin,
+    viewsets.ModelViewSet
+):
     """ Вьюсет для отзывов на произведения. """
     serializer_class = ReviewSerializer
+    include_allowed = ('comments',)
     permission_classes = (AuthorModAdminOrReadOnly,)
+    pagination_class = PageNumberOrKeysetPagination
+    keyset_ordering = ('-pub_date', 'id')
 
-    def get_queryset(self):
-        """ Принимает URL-ID произведения и берёт queryset его отзывов. """
-        title = get_object_or_404(Title, pk=self.kwargs.get('title_id'))
-        return title.reviews.all().order_by('-pub_date')
+    def get_title(self):
+        """ Произведение из URL: один запрос на весь запрос клиента. """
+        if not hasattr(self, '_title'):
+            self._title = get_object_or_404(
+                Title, pk=self.kwargs.get('title_id'))
+        return self._title
 
-    def perform_create(self, serializer):
-        """ Передаёт в сериализатор произведение и автора. """
-        title = get_object_or_404(Title, pk=self.kwargs.get('title_id'))
-        serializer.save(title=title, author=self.request.user)
+    def get_title_modified(self):
+        return self.get_title().modified
 
+    def get_queryset(self):
+        """
+        Принимает URL-ID произведения и берёт queryset его отзывов;
+        из авторов в том же запросе берутся только username.
+        """
+        return self.with_included(self.with_sparse_fields(
+            self.get_title().reviews.select_related('author').only(
+                'id', 'title', 'text', 'score', 'pub_date', 'comments_count',
+                'author__username',
+            ).order_by(*self.keyset_ordering)
+        ))
+
+    def with_included(self, queryset):
+        if 'comments' in self.get_include():
+            queryset = queryset.prefetch_related(comments_prefetch())
+        return queryset
 
-class CommentViewSet(viewsets.ModelViewSet):
+    def perform_create(self, serializer):
+        """
+        Передаёт в сериализатор произведение и автора. Повторный отзыв
+        отсекает ограничение `unique_review` в БД без отдельной проверки.
+        """
+        title = self.get_title()
+        try:
+            with transaction.atomic():
+                serializer.save(title=title, author=self.request.user)
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': [
+                'Уже оставляли отзыв на это произведение.']})
+
+
+class CommentViewSet(
+    SparseFieldsetMixin, TitleConditionalGetMixin, viewsets.ModelViewSet
+):
     """ Вьюсет для комментариев к отзывам. """
     serializer_class = CommentSerializer
     permission_classes = (AuthorModAdminOrReadOnly,)
+    pagination_class = PageNumberOrKeysetPagination
+    keyset_ordering = ('-pub_date', 'id')
+
+    def get_review(self):
+        """
+        Отзыв вместе с его произведением одним запросом с JOIN;
+        отзыв к другому произведению даёт 404.
+        """
+        if not hasattr(self, '_review'):
+            self._review = get_object_or_404(
+                Review.objects.select_related('title'),
+                pk=self.kwargs.get('review_id'),
+                title_id=self.kwargs.get('title_id'),
+            )
+        return self._review
+
+    def get_title_modified(self):
+        return self.get_review().title.modified
 
     def get_queryset(self):
-        """ Принимает URL-ID отзыва и берёт queryset его комментов. """
-        review = get_object_or_404(Review, pk=self.kwargs.get('review_id'))
-        return review.comments.all().order_by('-pub_date')
+        """
+        Принимает URL-ID отзыва и берёт queryset его комментов;
+        из авторов в том же запросе берутся только username.
+        """
+        return self.with_sparse_fields(
+            self.get_review().comments.select_related('author').only(
+                'id', 'review', 'text', 'pub_date', 'author__username',
+            ).order_by(*self.keyset_ordering)
+        )
 
     def perform_create(self, serializer):
-        """ Гарантирует авторство комментария. """
-        review = get_object_or_404(Review, pk=self.kwargs.get('review_id'))
-        serializer.save(review=review, author=self.request.user)
+        """
+        Гарантирует авторство комментария; вставка и счётчик
+        комментариев отзыва меняются в одной транзакции.
+        """
+        with transaction.atomic():
+            serializer.save(
+                review=self.get_review(), author=self.request.user)
+
+
+class ReviewBatchView(views.APIView):
+    """
+    Пакетная отправка отзывов на разные произведения одним запросом.
+    Принимает список отзывов и возвращает результат по каждому из них.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        items = request.data
+        max_size = settings.REVIEW_BATCH_MAX_SIZE
+        if not isinstance(items, list) or not items:
+            raise ValidationError({'non_field_errors': [
+                'Ожидается непустой список отзывов.']})
+        if len(items) > max_size:
+            raise ValidationError({'non_field_errors': [
+                f'В одном запросе не больше {max_size} отзывов.']})
+
+        results = [None] * len(items)
+        valid = {}
+        for index, item in enumerate(items):
+            serializer = ReviewBatchItemSerializer(data=item)
+            if serializer.is_valid():
+                valid[index] = serializer.validated_data
+            else:
+                results[index] = self.error(index, serializer.errors)
+
+        reviewed = self.get_reviewed_titles(
+            {data['title_id'] for data in valid.values()})
+        reviews = {}
+        for index, data in valid.items():
+            title_id = data['title_id']
+            if title_id not in reviewed:
+                results[index] = self.error(
+                    index, {'title': ['Произведение не найдено.']})
+            elif reviewed[title_id]:
+                results[index] = self.error(index, {'non_field_errors': [
+                    'Уже оставляли отзыв на это произведение.']})
+            else:
+                reviewed[title_id] = True
+                reviews[index] = Review(author=request.user, **data)
+
+        if reviews:
+            self.create_reviews(list(reviews.values()))
+        for index, review in reviews.items():
+            results[index] = {
+                'index': index,
+                'status': 'created',
+                'title': review.title_id,
+                'review': ReviewSerializer(review).data,
+            }
+        return Response(
+            {'created': len(reviews), 'results': results},
+            status=(status.HTTP_201_CREATED if reviews
+                    else status.HTTP_400_BAD_REQUEST),
+        )
+
+    @staticmethod
+    def error(index, errors):
+        return {'index': index, 'status': 'error', 'errors': errors}
+
+    def get_reviewed_titles(self, title_ids):
+        """
+        Проверка пакета против `unique_review` одним запросом:
+        для каждого существующего произведения — есть ли уже отзыв автора.
+        """
+        if not title_ids:
+            return {}
+        own_reviews = Review.objects.filter(
+            title=OuterRef('pk'), author=self.request.user)
+        return dict(
+            Title.objects.filter(pk__in=title_ids).annotate(
+                reviewed=Exists(own_reviews)
+            ).values_list('pk', 'reviewed')
+        )
+
+    def create_reviews(self, reviews):
+        """
+        Вставляет отзывы одним bulk_create и пересчитывает рейтинг по
+        разу на произведение. Гонку с параллельной отправкой того же
+        отзыва по-прежнему отсекает ограничение в БД.
+        """
+        try:
+            with transaction.atomic():
+                Review.objects.bulk_create(reviews)
+                ids = dict(Review.objects.filter(
+                    author=self.request.user,
+                    title_id__in=[review.title_id for review in reviews],
+                ).values_list('title_id', 'pk'))
+                for review in reviews:
+                    review.pk = ids[review.title_id]
+                add_review_scores(reviews)
+        except IntegrityError:
+            raise ValidationError({'non_field_errors': [
+                'Уже оставляли отзыв на одно из произведений.']})
+        bump_cache_version('titles')
 
 
 class UserRegistrationView(views.APIView):
@@ -111,21 +474,25 @@ class UserTokenView(views.APIView):
         if not request.data.get('username'):
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        user = get_object_or_404(User, username=request.data.get('username'))
-        if user.confirmation_code == request.data.get('confirmation_code'):
-            user.confirmation_code = str(uuid.uuid4())
+        user = get_object_or_404(
+            User.objects.only('pk', 'confirmation_code'),
+            username=request.data.get('username'))
+        code = request.data.get('confirmation_code')
+        if (check_confirmation_code(user, code)
+                and rotate_confirmation_code(user)):
             token = get_tokens_for_user(user)
-            user.save()
             return Response(token, status=status.HTTP_200_OK)
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """ Вьюсет управления пользователями для админа. """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     lookup_field = 'username'
     permission_classes = (SuperuserOrAdminOnly,)
+    pagination_class = PageNumberOrKeysetPagination
+    keyset_ordering = ('username',)
     filter_backends = (filters.SearchFilter,)
     search_fields = ('=username',)
 
@@ -104,12 +104,50 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Пользователи для аутентификации: сброс записи при смене роли или
+    # удалении должен дойти до всех воркеров, поэтому кэш общий.
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'auth_cache'),
+    },
+}
+
+# Кэш ответов каталога инвалидируется версиями при записи, TTL — страховка.
+# LocMem живёт в памяти процесса: при нескольких воркерах нужен общий кэш
+# (FileBasedCache, Redis, Memcached), иначе версии не синхронизируются.
+CATALOGUE_CACHE_TIMEOUT = 60 * 60
+
+# Лидерборды категорий и жанров: размер и байесовский априор. Взвешенный
+# рейтинг — (PRIOR_SCORE * PRIOR_WEIGHT + сумма оценок) / (PRIOR_WEIGHT
+# + число оценок), так что единственная десятка не обгонит сотню девяток.
+LEADERBOARD_SIZE = 10
+LEADERBOARD_PRIOR_SCORE = 5.5
+LEADERBOARD_PRIOR_WEIGHT = 5
+
+# Сколько последних отзывов и комментариев попадает в ответ с ?include=.
+INCLUDED_REVIEWS_PER_TITLE = 10
+INCLUDED_COMMENTS_PER_REVIEW = 5
+
+# Сколько отзывов можно отправить одним запросом на /api/v1/reviews/batch/.
+REVIEW_BATCH_MAX_SIZE = 100
+
+# Сколько секунд воркер помнит пользователя из JWT, не обращаясь к БД.
+# Изменение или удаление пользователя сбрасывает запись сразу.
+AUTH_USER_CACHE_TIMEOUT = 5 * 60
+
+# Сколько проверенных JWT держит в памяти каждый воркер (0 — не держать).
+VERIFIED_TOKEN_CACHE_SIZE = 4096
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'AUTH_HEADER_TYPES': ('Bearer',),
@@ -118,3 +156,22 @@ SIMPLE_JWT = {
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 DEFAULT_FROM_EMAIL = 'yamdb@example.com'
+
+# Письма с кодом подтверждения пишутся в таблицу исходящих в транзакции
+# регистрации и отправляются командой send_outbox, а не в запросе.
+# Повтор после ошибки — через EMAIL_OUTBOX_RETRY_DELAY * 2 ** (попытка - 1)
+# секунд, не больше EMAIL_OUTBOX_MAX_ATTEMPTS попыток.
+EMAIL_OUTBOX = False
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60
+# На сколько секунд воркер забирает письма себе; если он упадёт, письма
+# снова станут доступны другим по истечении этого срока.
+EMAIL_OUTBOX_LEASE = 5 * 60
+
+# Коды подтверждения — подписи HMAC над id пользователя и одноразовым
+# значением из User.confirmation_code, действующие CONFIRMATION_CODE_MAX_AGE
+# секунд. Повторный запрос кода не пишет в БД, а обмен кода на токен
+# обновляет одну колонку. Без этой настройки код хранится в БД как есть.
+SIGNED_CONFIRMATION_CODES = False
+CONFIRMATION_CODE_MAX_AGE = 24 * 60 * 60
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.utils.text import Truncator
 
-from .models import Category, Genre, Title, Review, Comment, User
+from .models import (Category, Genre, Title, Review, Comment, OutboxEmail,
+                     User)
 
 
 @admin.register(User)
@@ -60,3 +61,11 @@ class CommentAdmin(admin.ModelAdmin):
     def review_id(self, Review):
         return Review.pk
     review_id.short_description = 'ID отзыва'
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'to', 'subject', 'attempts', 'next_attempt',
+                    'last_error')
+    list_display_links = ('pk',)
+    search_fields = ('to',)
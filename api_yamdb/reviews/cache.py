@@ -0,0 +1,44 @@
+"""
+Версии закэшированных данных каталога. Модуль живёт в reviews, потому
+что версии повышают и сигналы/команды приложения с моделями, и API.
+"""
+import time
+
+from django.core.cache import caches
+
+CATALOGUE_RESOURCES = ('categories', 'genres', 'titles', 'leaderboards')
+
+# Версия лежит в том же кэше, что и данные ресурса: пользователи для
+# аутентификации хранятся в общем для воркеров кэше 'auth'.
+RESOURCE_CACHES = {'users': 'auth'}
+
+
+def resource_cache(resource):
+    return caches[RESOURCE_CACHES.get(resource, 'default')]
+
+
+def version_key(resource):
+    return f'catalogue-version:{resource}'
+
+
+def new_version():
+    """
+    Начальная версия берётся от времени, чтобы после вытеснения ключа
+    версии из кэша она не совпала со старыми закэшированными ответами.
+    """
+    return int(time.time() * 1000)
+
+
+def get_cache_version(resource):
+    return resource_cache(resource).get_or_set(
+        version_key(resource), new_version, timeout=None)
+
+
+def bump_cache_version(*resources):
+    """ Инвалидирует кэш ответов ресурсов, повышая их версии. """
+    for resource in resources:
+        cache = resource_cache(resource)
+        try:
+            cache.incr(version_key(resource))
+        except ValueError:
+            cache.set(version_key(resource), new_version(), timeout=None)
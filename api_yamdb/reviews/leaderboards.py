@@ -0,0 +1,82 @@
+"""
+Лидерборды категорий и жанров: топ произведений по взвешенному рейтингу.
+
+Списки хранятся в кэше готовыми к отдаче. Изменение оценки перестраивает
+только те списки, в которые произведение входит или может войти; правки
+самих произведений, категорий и жанров сбрасывают все списки версией
+ресурса `leaderboards`.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_cache_version
+
+from .models import Title
+
+LEADERBOARD_KINDS = ('category', 'genre')
+LEADERBOARD_FIELDS = (
+    'id', 'name', 'year', 'rating', 'score_count', 'weighted_rating')
+
+
+def leaderboard_key(kind, slug):
+    version = get_cache_version('leaderboards')
+    return f'leaderboard:{version}:{kind}:{slug}'
+
+
+def build_leaderboard(kind, slug):
+    """ Считает топ одним запросом по взвешенному рейтингу и кладёт в кэш. """
+    entries = list(
+        Title.objects.filter(
+            **{f'{kind}__slug': slug}, score_count__gt=0
+        ).order_by(
+            '-weighted_rating', '-score_count', 'id'
+        ).values(*LEADERBOARD_FIELDS)[:settings.LEADERBOARD_SIZE]
+    )
+    cache.set(
+        leaderboard_key(kind, slug), entries,
+        timeout=settings.CATALOGUE_CACHE_TIMEOUT)
+    return entries
+
+
+def get_leaderboard(kind, slug):
+    entries = cache.get(leaderboard_key(kind, slug))
+    if entries is None:
+        entries = build_leaderboard(kind, slug)
+    return entries
+
+
+def can_change_leaderboard(entries, title_id, weighted_rating):
+    """
+    Произведение меняет топ, если оно в нём уже есть или его новый
+    рейтинг не ниже последнего места (либо в топе ещё есть места).
+    """
+    if any(entry['id'] == title_id for entry in entries):
+        return True
+    if weighted_rating is None:
+        return False
+    return (
+        len(entries) < settings.LEADERBOARD_SIZE
+        or weighted_rating >= entries[-1]['weighted_rating']
+    )
+
+
+def refresh_title_leaderboards(title_id):
+    """
+    Перестраивает лидерборды категории и жанров произведения после
+    изменения его оценок. Ещё не построенные списки не трогает —
+    они соберутся при первом чтении.
+    """
+    rows = Title.objects.filter(pk=title_id).values_list(
+        'weighted_rating', 'category__slug', 'genre__slug')
+    boards = set()
+    weighted_rating = None
+    for weighted_rating, category, genre in rows:
+        boards.update((('category', category), ('genre', genre)))
+    for kind, slug in boards:
+        if slug is None:
+            continue
+        entries = cache.get(leaderboard_key(kind, slug))
+        if entries is not None and can_change_leaderboard(
+            entries, title_id, weighted_rating
+        ):
+            build_leaderboard(kind, slug)
@@ -1,8 +1,23 @@
 import csv
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from reviews.cache import CATALOGUE_RESOURCES, bump_cache_version
 from reviews.models import (Category, Genre, Title, User,
-                            GenreTitle, Review, Comment)
+                            GenreTitle, Review, Comment, ImportChecksum)
+from reviews.management import csv_pipeline
+from reviews.utils import (recalculate_comment_counts,
+                           recalculate_title_scores, touch_titles)
 
 CSV_MODEL = {
     'users': User,
@@ -14,18 +29,414 @@ CSV_MODEL = {
     'comments': Comment,
 }
 DIR = settings.BASE_DIR
+# Колонка родителя, чьи денормализованные данные зависят от строки.
+PARENT_COLUMNS = {
+    GenreTitle: 'title_id',
+    Review: 'title_id',
+    Comment: 'review_id',
+}
+BATCH_SIZE = 1000
+QUEUE_SIZE = 8
+
+
+def csv_path(csv_name, data_dir=None):
+    """ Путь к CSV; вместо него может лежать сжатая выгрузка .csv.gz. """
+    path = os.path.join(data_dir or DIR + '/static/data', f'{csv_name}.csv')
+    if not os.path.exists(path) and os.path.exists(path + '.gz'):
+        return path + '.gz'
+    return path
+
+
+def read_rows(csv_name, data_dir=None):
+    """ Построчно читает CSV-файл, не загружая его целиком в память. """
+    with csv_pipeline.open_csv(csv_path(csv_name, data_dir)) as file:
+        yield from csv.DictReader(file, delimiter=",")
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def foreign_keys(model):
+    """ Словарь `колонка_id: модель` внешних ключей модели. """
+    return {
+        field.attname: field.related_model
+        for field in model._meta.concrete_fields
+        if field.is_relation
+    }
+
+
+def data_fields(model, columns):
+    """
+    Поля модели из колонок CSV, которые сравниваются и обновляются
+    при инкрементальной загрузке: без id и дат, заполняемых автоматически.
+    """
+    fields = []
+    for column in columns:
+        field = model._meta.get_field(column)
+        if field.primary_key or getattr(field, 'auto_now_add', False):
+            continue
+        fields.append(field.attname)
+    return sorted(fields)
+
+
+def row_checksum(row, fields):
+    values = json.dumps([row[field] for field in fields], ensure_ascii=False)
+    return hashlib.md5(values.encode()).hexdigest()
 
 
 class Command(BaseCommand):
     help = 'Loads data to database from csv files'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data-dir',
+            help='Папка с CSV (по умолчанию static/data), '
+                 'файлы могут быть сжаты в .csv.gz')
+        parser.add_argument(
+            '--bulk', action='store_true',
+            help='Загружать пачками через bulk_create, '
+                 'одна транзакция на таблицу')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Размер пачки для --bulk')
+        parser.add_argument(
+            '--truncate', action='store_true',
+            help='Перед загрузкой очистить таблицы из CSV '
+                 '(суперпользователи сохраняются)')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Вставить новые и обновить изменившиеся строки '
+                 'по id и контрольной сумме')
+        parser.add_argument(
+            '--delete-missing', action='store_true',
+            help='Для --incremental: удалить ранее загруженные строки, '
+                 'которых больше нет в CSV')
+        parser.add_argument(
+            '--parallel', action='store_true',
+            help='Разбирать и валидировать CSV в пуле процессов, '
+                 'записывать одним писателем в порядке зависимостей')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов для --parallel')
+        parser.add_argument(
+            '--queue-size', type=int, default=QUEUE_SIZE,
+            help='Сколько пачек на файл может ждать записи в --parallel')
+
     def handle(self, *args, **options):
-        for csv_name in CSV_MODEL:
-            with open(
-                DIR + f'/static/data/{csv_name}.csv',
-                'r',
-                encoding="utf-8-sig"
-            ) as file:
-                reader = csv.DictReader(file, delimiter=",")
-                for row in reader:
-                    CSV_MODEL[csv_name].objects.get_or_create(**row)
+        self.data_dir = options['data_dir']
+        if options['truncate']:
+            self.truncate()
+        if options['incremental']:
+            self.incremental_load(
+                options['batch_size'], options['delete_missing'])
+            return
+        if options['parallel']:
+            self.parallel_load(
+                options['batch_size'], options['workers'],
+                options['queue_size'])
+            return
+        if options['bulk']:
+            self.bulk_load(options['batch_size'])
+            return
+        for csv_name, model in CSV_MODEL.items():
+            rows = read_rows(csv_name, self.data_dir)
+            for row in self.typed_rows(model, rows):
+                model.objects.get_or_create(**row)
+
+    def truncate(self):
+        """ Очищает таблицы в порядке, обратном зависимостям. """
+        with transaction.atomic(), connection.cursor() as cursor:
+            ImportChecksum.objects.all().delete()
+            for model in reversed(list(CSV_MODEL.values())):
+                if model is User:
+                    User.objects.filter(is_superuser=False).delete()
+                    continue
+                cursor.execute(
+                    'DELETE FROM '
+                    + connection.ops.quote_name(model._meta.db_table))
+
+    def bulk_load(self, batch_size):
+        id_maps = {}
+        for csv_name, model in CSV_MODEL.items():
+            started = time.monotonic()
+            loaded, skipped = self.bulk_load_model(
+                csv_name, model, batch_size, id_maps)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{csv_name}: {loaded} строк за {elapsed:.2f} с '
+                f'({loaded / elapsed if elapsed else loaded:.0f} строк/с)'
+                + (f', пропущено {skipped}' if skipped else '')
+            )
+        recalculate_title_scores()
+        recalculate_comment_counts()
+        bump_cache_version(*CATALOGUE_RESOURCES, 'users')
+
+    def parallel_load(self, batch_size, workers, queue_size):
+        """
+        Конвейер загрузки: все CSV разбираются и валидируются параллельно
+        в пуле процессов, готовые пачки идут через ограниченные очереди,
+        а единственный писатель применяет их в порядке CSV_MODEL
+        (пользователи, категории, жанры → произведения → жанры
+        произведений → отзывы → комментарии). Задачи стартуют в том же
+        порядке, поэтому таблица, которую ждёт писатель, всегда уже
+        разбирается и конвейер не блокируется.
+        """
+        id_maps = {}
+        total_started = time.monotonic()
+        total = 0
+        # Менеджер очередей закрывается первым: при ошибке писателя
+        # воркеры, ждущие места в очереди, получат исключение и завершатся.
+        with ProcessPoolExecutor(
+            max_workers=workers
+        ) as executor, multiprocessing.Manager() as manager:
+            queues = {}
+            futures = []
+            for csv_name, model in CSV_MODEL.items():
+                queues[csv_name] = manager.Queue(maxsize=queue_size)
+                futures.append(executor.submit(
+                    csv_pipeline.parse_csv, csv_path(csv_name, self.data_dir),
+                    model._meta.label, batch_size, queues[csv_name]))
+            for csv_name, model in CSV_MODEL.items():
+                started = time.monotonic()
+                loaded, skipped, parsed = self.write_from_queue(
+                    queues[csv_name], model, id_maps)
+                elapsed = time.monotonic() - started
+                total += loaded
+                self.stdout.write(
+                    f'{csv_name}: {loaded} строк за {elapsed:.2f} с '
+                    f'({loaded / elapsed if elapsed else loaded:.0f} '
+                    f'строк/с), отклонено при валидации '
+                    f'{parsed["rejected"]}, пропущено {skipped}'
+                )
+            for future in futures:
+                future.result()
+        elapsed = time.monotonic() - total_started
+        self.stdout.write(
+            f'Всего: {total} строк за {elapsed:.2f} с '
+            f'({total / elapsed if elapsed else total:.0f} строк/с)'
+        )
+        recalculate_title_scores()
+        recalculate_comment_counts()
+        bump_cache_version(*CATALOGUE_RESOURCES, 'users')
+
+    def write_from_queue(self, queue, model, id_maps):
+        """ Писатель: забирает пачки из очереди и пишет их транзакцией. """
+        relations = self.load_id_maps(model, id_maps)
+        loaded = skipped = 0
+        with transaction.atomic():
+            while True:
+                kind, payload = queue.get()
+                if kind == csv_pipeline.ERROR:
+                    raise CommandError(
+                        f'{model._meta.label}: ошибка разбора CSV: {payload}')
+                if kind == csv_pipeline.DONE:
+                    return loaded, skipped, payload
+                rows = self.valid_rows(payload, relations, id_maps)
+                skipped += len(payload) - len(rows)
+                model.objects.bulk_create(
+                    [model(**row) for row in rows], ignore_conflicts=True)
+                loaded += len(rows)
+
+    def bulk_load_model(self, csv_name, model, batch_size, id_maps):
+        """
+        Загружает CSV одной транзакцией. Строки с уже существующим id
+        игнорируются.
+        """
+        relations = self.load_id_maps(model, id_maps)
+        loaded = skipped = 0
+        with transaction.atomic():
+            reader = read_rows(csv_name, self.data_dir)
+            for chunk in chunked(reader, batch_size):
+                rows = self.valid_rows(
+                    list(self.typed_rows(model, chunk)), relations, id_maps)
+                skipped += len(chunk) - len(rows)
+                model.objects.bulk_create(
+                    [model(**row) for row in rows], ignore_conflicts=True)
+                loaded += len(rows)
+        return loaded, skipped
+
+    def typed_rows(self, model, rows):
+        """
+        Приводит строки CSV к типам полей, как парсер --parallel: пустая
+        строка в nullable-поле (например, оценка без значения из
+        csv_export) становится None. Невалидные строки пропускаются.
+        """
+        for row in rows:
+            try:
+                yield csv_pipeline.typed_row(model, row)
+            except ValidationError:
+                continue
+
+    def typed_pairs(self, model, rows):
+        """
+        Как typed_rows, но сохраняет и исходную строку (по ней считается
+        контрольная сумма): словарь `id: (строка CSV, типизированная)`.
+        Строки с нечисловым id или внешним ключом пропускаются здесь,
+        до проверки ключей.
+        """
+        pairs = {}
+        for row in rows:
+            try:
+                values = csv_pipeline.typed_row(model, row)
+            except ValidationError:
+                continue
+            pairs[values['id']] = (row, values)
+        return pairs
+
+    def load_id_maps(self, model, id_maps):
+        """
+        Готовит множества id таблиц, на которые ссылается модель.
+        Внешние ключи строк проверяются по ним без запросов к БД.
+        """
+        relations = foreign_keys(model)
+        for related_model in relations.values():
+            if related_model not in id_maps:
+                id_maps[related_model] = set(
+                    related_model.objects.values_list('pk', flat=True))
+        return relations
+
+    def valid_rows(self, rows, relations, id_maps):
+        """ Отбрасывает строки с висячими внешними ключами. """
+        return [
+            row for row in rows
+            if all(
+                int(row[column]) in id_maps[related_model]
+                for column, related_model in relations.items()
+                if row.get(column)
+            )
+        ]
+
+    def incremental_load(self, batch_size, delete_missing):
+        id_maps = {}
+        affected = {'titles': set(), 'scores': set(), 'reviews': set()}
+        for csv_name, model in CSV_MODEL.items():
+            started = time.monotonic()
+            stats = self.incremental_load_model(
+                csv_name, model, batch_size, delete_missing, id_maps,
+                affected)
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f'{csv_name}: добавлено {stats["created"]}, '
+                f'обновлено {stats["updated"]}, '
+                f'без изменений {stats["unchanged"]}, '
+                f'удалено {stats["deleted"]}, '
+                f'пропущено {stats["skipped"]} за {elapsed:.2f} с'
+            )
+        if affected['scores']:
+            recalculate_title_scores(
+                Title.objects.filter(pk__in=affected['scores']))
+        if affected['titles'] or affected['scores']:
+            touch_titles(pk__in=affected['titles'] | affected['scores'])
+        if affected['reviews']:
+            recalculate_comment_counts(
+                Review.objects.filter(pk__in=affected['reviews']))
+            touch_titles(reviews__in=affected['reviews'])
+        bump_cache_version(*CATALOGUE_RESOURCES, 'users')
+
+    def incremental_load_model(self, csv_name, model, batch_size,
+                               delete_missing, id_maps, affected):
+        """
+        Сравнивает строки CSV с контрольными суммами прошлой загрузки:
+        новые id вставляет, изменившиеся обновляет, остальные пропускает.
+        Все записи идут пачками внутри одной транзакции на таблицу.
+        """
+        relations = self.load_id_maps(model, id_maps)
+        stats = dict.fromkeys(
+            ('created', 'updated', 'unchanged', 'deleted', 'skipped'), 0)
+        seen = set()
+        fields = None
+        with transaction.atomic():
+            reader = read_rows(csv_name, self.data_dir)
+            for chunk in chunked(reader, batch_size):
+                if fields is None:
+                    fields = data_fields(model, chunk[0].keys())
+                rows = self.typed_pairs(model, chunk)
+                valid = self.valid_rows(
+                    [values for _, values in rows.values()],
+                    relations, id_maps)
+                rows = {values['id']: rows[values['id']] for values in valid}
+                stats['skipped'] += len(chunk) - len(rows)
+                seen.update(rows)
+                checksums = dict(ImportChecksum.objects.filter(
+                    table=csv_name, row_id__in=rows
+                ).values_list('row_id', 'checksum'))
+                # Для обновлённых строк нужен и прежний родитель: при
+                # переносе пересчитываются оба.
+                existing = dict(model.objects.filter(pk__in=rows).values_list(
+                    'pk', PARENT_COLUMNS.get(model, 'pk')))
+
+                created, updated, new_checksums = [], [], []
+                for row_id, (row, values) in rows.items():
+                    checksum = row_checksum(row, fields)
+                    if (
+                        row_id in existing
+                        and checksums.get(row_id) == checksum
+                    ):
+                        stats['unchanged'] += 1
+                        continue
+                    instance = model(**values)
+                    if row_id in existing:
+                        updated.append(instance)
+                    else:
+                        created.append(instance)
+                    new_checksums.append(ImportChecksum(
+                        table=csv_name, row_id=row_id, checksum=checksum))
+                    self.collect_affected(
+                        model, values, affected, existing.get(row_id))
+
+                model.objects.bulk_create(created)
+                if updated and fields:
+                    model.objects.bulk_update(updated, fields)
+                ImportChecksum.objects.filter(
+                    table=csv_name,
+                    row_id__in=[item.row_id for item in new_checksums]
+                ).delete()
+                ImportChecksum.objects.bulk_create(new_checksums)
+                stats['created'] += len(created)
+                stats['updated'] += len(updated)
+
+            if delete_missing:
+                stats['deleted'] = self.delete_missing(
+                    csv_name, model, seen, batch_size)
+        return stats
+
+    def collect_affected(self, model, row, affected, previous_parent=None):
+        """
+        Запоминает произведения и отзывы, чьи данные, рейтинг или счётчики
+        изменились: нового родителя строки и прежнего, если она перенесена.
+        """
+        if model is Title:
+            affected['titles'].add(int(row['id']))
+            return
+        kind = {GenreTitle: 'titles', Review: 'scores', Comment: 'reviews'}
+        if model not in kind:
+            return
+        parents = affected[kind[model]]
+        parents.add(int(row[PARENT_COLUMNS[model]]))
+        if previous_parent is not None:
+            parents.add(previous_parent)
+
+    def delete_missing(self, csv_name, model, seen, batch_size):
+        """
+        Удаляет только строки, загруженные прошлыми импортами и
+        пропавшие из CSV. Удаление идёт через ORM, поэтому каскады
+        и сигналы (рейтинг, кэш) отрабатывают как обычно.
+        """
+        missing = [
+            row_id for row_id in ImportChecksum.objects.filter(
+                table=csv_name).values_list('row_id', flat=True).iterator()
+            if row_id not in seen
+        ]
+        deleted = 0
+        for chunk in chunked(missing, batch_size):
+            deleted += model.objects.filter(pk__in=chunk).delete()[1].get(
+                model._meta.label, 0)
+            ImportChecksum.objects.filter(
+                table=csv_name, row_id__in=chunk).delete()
+        return deleted
@@ -0,0 +1,77 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from reviews.cache import bump_cache_version
+from reviews.management.commands.csv_load import chunked
+from reviews.models import Review, Title
+from reviews.utils import recalculate_comment_counts, recalculate_title_scores
+
+CHUNK_SIZE = 1000
+COUNTERS = (
+    ('titles', Title, recalculate_title_scores),
+    ('reviews', Review, recalculate_comment_counts),
+)
+
+
+def pk_ranges(model, chunk_size):
+    """ Границы кусков по первичному ключу, по chunk_size строк в каждом. """
+    pks = model.objects.order_by('pk').values_list('pk', flat=True)
+    for chunk in chunked(pks.iterator(), chunk_size):
+        yield chunk[0], chunk[-1]
+
+
+def repair_chunk(model, recalculate, pk_range):
+    """
+    Пересчитывает счётчики одного куска в своей транзакции и на своём
+    соединении: Django открывает отдельное соединение в каждом потоке.
+    """
+    try:
+        with transaction.atomic():
+            recalculate(model.objects.filter(pk__range=pk_range))
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Recomputes denormalized title and review counters '
+            'from reviews and comments')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк пересчитывать в одной транзакции')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число потоков, пересчитывающих куски параллельно '
+                 '(на SQLite всегда один)')
+
+    def handle(self, *args, **options):
+        """
+        Восстанавливает рейтинг, гистограмму и число отзывов произведений
+        и число комментариев отзывов по исходным таблицам. Куски по
+        первичному ключу пересчитываются параллельно короткими
+        транзакциями, так что таблицы не блокируются надолго.
+        """
+        workers = options['workers']
+        if connection.vendor == 'sqlite':
+            # SQLite всё равно пишет по одному, а параллельные писатели
+            # получают «database is locked».
+            workers = 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for name, model, recalculate in COUNTERS:
+                started = time.monotonic()
+                ranges = list(pk_ranges(model, options['chunk_size']))
+                futures = [
+                    executor.submit(repair_chunk, model, recalculate, pk_range)
+                    for pk_range in ranges
+                ]
+                for future in futures:
+                    future.result()
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{name}: {len(futures)} кусков за {elapsed:.2f} с')
+        bump_cache_version('titles', 'leaderboards')
@@ -0,0 +1,73 @@
+"""
+Разбор CSV в отдельных процессах для параллельного csv_load.
+
+Модуль не импортирует модели на верхнем уровне: при запуске процессов
+методом spawn Django настраивается уже внутри воркера.
+"""
+import csv
+import gzip
+
+ROWS = 'rows'
+DONE = 'done'
+ERROR = 'error'
+
+
+def open_csv(path):
+    """ Открывает CSV или сжатый .csv.gz на чтение. """
+    opener = gzip.open if path.endswith('.gz') else open
+    return opener(path, 'rt', encoding="utf-8-sig", newline='')
+
+
+def setup_django():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def typed_row(model, row):
+    """
+    Приводит значения строки к типам полей модели и прогоняет
+    валидаторы полей (например, оценку 1–10).
+    """
+    result = {}
+    for column, value in row.items():
+        field = model._meta.get_field(column)
+        if value == '' and field.null:
+            value = None
+        elif not (value == '' and field.empty_strings_allowed):
+            value = field.to_python(value)
+        if value is not None:
+            field.run_validators(value)
+        result[field.attname] = value
+    return result
+
+
+def parse_csv(path, model_label, batch_size, queue):
+    """
+    Читает CSV, валидирует строки и кладёт их пачками в ограниченную
+    очередь. Когда очередь полна, воркер ждёт, пока писатель её разберёт.
+    """
+    try:
+        setup_django()
+        from django.apps import apps
+        from django.core.exceptions import ValidationError
+        model = apps.get_model(model_label)
+        parsed = rejected = 0
+        chunk = []
+        with open_csv(path) as file:
+            for row in csv.DictReader(file, delimiter=","):
+                try:
+                    chunk.append(typed_row(model, row))
+                except ValidationError:
+                    rejected += 1
+                    continue
+                parsed += 1
+                if len(chunk) >= batch_size:
+                    queue.put((ROWS, chunk))
+                    chunk = []
+        if chunk:
+            queue.put((ROWS, chunk))
+        queue.put((DONE, {'parsed': parsed, 'rejected': rejected}))
+    except Exception as error:
+        queue.put((ERROR, repr(error)))
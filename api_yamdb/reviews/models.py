@@ -1,6 +1,16 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
+
+MIN_SCORE = 1
+MAX_SCORE = 10
+SCORES = range(MIN_SCORE, MAX_SCORE + 1)
+
+
+def score_field(score):
+    """ Имя поля Title со счётчиком отзывов с данной оценкой. """
+    return f'score_{score}'
 
 
 class User(AbstractUser):
@@ -16,11 +26,14 @@ class User(AbstractUser):
         choices=USER_ROLES,
         default='user'
     )
+    email = models.EmailField(
+        'адрес электронной почты', max_length=254, unique=True)
     bio = models.TextField(blank=True)
     confirmation_code = models.CharField(max_length=254)
 
     class Meta:
         ordering = ('username',)
+        indexes = [models.Index(fields=('role',), name='user_role_idx')]
 
     def is_user_role(self):
         """ Метод вывода прав доступа пользователя. """
@@ -40,6 +53,9 @@ class Category(models.Model):
     name = models.CharField(max_length=256)
     slug = models.SlugField(max_length=50, unique=True)
 
+    class Meta:
+        indexes = [models.Index(fields=('name',), name='category_name_idx')]
+
     def __str__(self):
         return self.name
 
@@ -49,6 +65,9 @@ class Genre(models.Model):
     name = models.CharField(max_length=256)
     slug = models.SlugField(max_length=50, unique=True)
 
+    class Meta:
+        indexes = [models.Index(fields=('name',), name='genre_name_idx')]
+
     def __str__(self):
         return self.name
 
@@ -58,15 +77,59 @@ class Title(models.Model):
     name = models.CharField(max_length=200)
     year = models.IntegerField()
     rating = models.IntegerField('Рейтинг', blank=True, null=True)
+    weighted_rating = models.FloatField(
+        'Взвешенный рейтинг', null=True, editable=False)
+    score_sum = models.PositiveIntegerField(
+        'Сумма оценок', default=0, editable=False)
+    score_count = models.PositiveIntegerField(
+        'Количество оценок', default=0, editable=False)
+    reviews_count = models.PositiveIntegerField(
+        'Количество отзывов', default=0, editable=False)
+    # Гистограмма оценок: по счётчику на каждое значение из SCORES.
+    score_1 = models.PositiveIntegerField(
+        'Оценок 1', default=0, editable=False)
+    score_2 = models.PositiveIntegerField(
+        'Оценок 2', default=0, editable=False)
+    score_3 = models.PositiveIntegerField(
+        'Оценок 3', default=0, editable=False)
+    score_4 = models.PositiveIntegerField(
+        'Оценок 4', default=0, editable=False)
+    score_5 = models.PositiveIntegerField(
+        'Оценок 5', default=0, editable=False)
+    score_6 = models.PositiveIntegerField(
+        'Оценок 6', default=0, editable=False)
+    score_7 = models.PositiveIntegerField(
+        'Оценок 7', default=0, editable=False)
+    score_8 = models.PositiveIntegerField(
+        'Оценок 8', default=0, editable=False)
+    score_9 = models.PositiveIntegerField(
+        'Оценок 9', default=0, editable=False)
+    score_10 = models.PositiveIntegerField(
+        'Оценок 10', default=0, editable=False)
     description = models.TextField('Описание', blank=True, null=True)
+    # Отдельные индексы внешних ключей ниже не создаются там, где их
+    # покрывает составной индекс или ограничение с тем же первым полем.
     category = models.ForeignKey(
         Category,
         on_delete=models.SET_NULL,
         related_name='category',
+        db_index=False,
         blank=True,
         null=True,
     )
     genre = models.ManyToManyField(Genre, through='GenreTitle')
+    modified = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Порядок списка и курсора: ('-year', 'id').
+            models.Index(fields=('-year', 'id'), name='title_year_idx'),
+            models.Index(
+                fields=('category', '-weighted_rating'),
+                name='title_category_top_idx'),
+            # Выгрузка изменений с ?since=.
+            models.Index(fields=('modified',), name='title_modified_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -74,9 +137,16 @@ class Title(models.Model):
 
 class GenreTitle(models.Model):
     """ Through-модель для жанров/произведений. """
-    genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+    genre = models.ForeignKey(
+        Genre, on_delete=models.CASCADE, db_index=False)
     title = models.ForeignKey(Title, on_delete=models.CASCADE)
 
+    class Meta:
+        # Уникальный индекс (genre, title) обслуживает и фильтр по жанру.
+        constraints = [models.UniqueConstraint(
+                       fields=('genre', 'title'),
+                       name='unique_genre_title')]
+
     def __str__(self):
         return f'{self.genre} {self.title}'
 
@@ -84,27 +154,78 @@ class GenreTitle(models.Model):
 class Review(models.Model):
     """ Модель для отзывов на произведения. """
     title = models.ForeignKey(
-        Title, related_name='reviews', on_delete=models.CASCADE)
+        Title, related_name='reviews', on_delete=models.CASCADE,
+        db_index=False)
     text = models.TextField('Текст отзыва', max_length=6000)
     author = models.ForeignKey(
-        User, related_name='reviews', on_delete=models.CASCADE)
+        User, related_name='reviews', on_delete=models.CASCADE,
+        db_index=False)
     score = models.IntegerField(
         'Оценка', blank=True, null=True,
-        validators=[MinValueValidator(1), MaxValueValidator(10)],
+        validators=[
+            MinValueValidator(MIN_SCORE), MaxValueValidator(MAX_SCORE)],
     )
     pub_date = models.DateTimeField('Дата', auto_now_add=True)
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев', default=0, editable=False)
 
     class Meta:
         constraints = [models.UniqueConstraint(
                        fields=('author', 'title'),
                        name='unique_review')]
+        indexes = [models.Index(
+            fields=('title', '-pub_date', 'id'), name='review_title_date_idx')]
 
 
 class Comment(models.Model):
     """ Модель для комментариев к отзывам на произведения. """
     review = models.ForeignKey(
-        Review, related_name='comments', on_delete=models.CASCADE)
+        Review, related_name='comments', on_delete=models.CASCADE,
+        db_index=False)
     text = models.TextField('Комментарий', max_length=2000)
     author = models.ForeignKey(
         User, related_name='comments', on_delete=models.CASCADE)
     pub_date = models.DateTimeField('Дата', auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(
+            fields=('review', '-pub_date', 'id'),
+            name='comment_review_date_idx')]
+
+
+class ImportChecksum(models.Model):
+    """ Контрольные суммы строк CSV для инкрементального csv_load. """
+    table = models.CharField(max_length=50)
+    row_id = models.IntegerField()
+    checksum = models.CharField(max_length=32)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+                       fields=('table', 'row_id'),
+                       name='unique_import_row')]
+
+
+class OutboxEmail(models.Model):
+    """
+    Письмо, ожидающее отправки командой send_outbox. Отправленные письма
+    удаляются; исчерпавшие попытки остаются с текстом последней ошибки.
+    Воркер, взявший письмо, пишет свой токен в claimed_by и сдвигает
+    next_attempt на срок аренды: если он упадёт, письмо снова станет
+    доступно, когда аренда истечёт.
+    """
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.EmailField(max_length=254)
+    created = models.DateTimeField(auto_now_add=True)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    claimed_by = models.CharField(max_length=32, blank=True)
+
+    class Meta:
+        indexes = [models.Index(
+            fields=('next_attempt', 'id'), name='outbox_next_attempt_idx')]
+
+    def __str__(self):
+        return f'{self.to}: {self.subject}'
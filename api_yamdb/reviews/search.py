@@ -0,0 +1,75 @@
+import re
+
+from django.db import connections
+
+TITLE_TABLE = 'reviews_title'
+TITLE_FTS_TABLE = 'reviews_title_fts'
+
+TITLE_FTS_SQL = (
+    f"""
+    CREATE VIRTUAL TABLE {TITLE_FTS_TABLE} USING fts5(
+        name, description,
+        content='{TITLE_TABLE}', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TITLE_FTS_TABLE}_ai
+    AFTER INSERT ON {TITLE_TABLE} BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TITLE_FTS_TABLE}_ad
+    AFTER DELETE ON {TITLE_TABLE} BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(
+            {TITLE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TITLE_FTS_TABLE}_au
+    AFTER UPDATE OF name, description ON {TITLE_TABLE} BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(
+            {TITLE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}) VALUES ('rebuild')",
+)
+
+
+def title_search_available(using='default'):
+    """ Полнотекстовый индекс произведений есть только в SQLite (FTS5). """
+    return connections[using].vendor == 'sqlite'
+
+
+def create_title_search_index(using='default'):
+    """
+    Создаёт FTS5-таблицу по названию и описанию произведений
+    и триггеры, которые синхронизируют её с таблицей `Title`
+    при любых записях, включая bulk_create и update().
+    """
+    if not title_search_available(using):
+        return
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if TITLE_FTS_TABLE in connection.introspection.table_names(cursor):
+            return
+        for statement in TITLE_FTS_SQL:
+            cursor.execute(statement)
+
+
+def title_match_query(value):
+    """
+    Переводит пользовательский ввод в безопасный FTS5-запрос:
+    все слова обязательны, последнее ищется по префиксу.
+    """
+    words = re.findall(r'\w+', value)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
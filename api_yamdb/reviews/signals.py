@@ -0,0 +1,193 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import (m2m_changed, post_delete, post_init,
+                                      post_migrate, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from .models import (Category, Comment, Genre, GenreTitle, Review, Title,
+                     User)
+from .search import create_title_search_index
+from .utils import change_comments_count, change_title_score, touch_titles
+
+
+def remember_review_state(review):
+    """
+    Запоминает оценку и произведение отзыва в том виде, как в БД. Поля,
+    не загруженные через only()/defer(), помечаются DEFERRED и дочитываются
+    из БД перед сохранением или удалением.
+    """
+    deferred = review.get_deferred_fields()
+    review._saved_score = (
+        DEFERRED if 'score' in deferred else review.__dict__.get('score'))
+    review._saved_title_id = (
+        DEFERRED if 'title_id' in deferred
+        else review.__dict__.get('title_id'))
+
+
+def load_review_state(review):
+    """ Дочитывает из БД запомненные значения, которые не были загружены. """
+    if DEFERRED not in (review._saved_score, review._saved_title_id):
+        return
+    saved = Review.objects.filter(pk=review.pk).values(
+        'score', 'title_id').first()
+    if saved is None:
+        return
+    if review._saved_score is DEFERRED:
+        review._saved_score = saved['score']
+    if review._saved_title_id is DEFERRED:
+        review._saved_title_id = saved['title_id']
+
+
+@receiver(post_init, sender=Review)
+def review_loaded(sender, instance, **kwargs):
+    remember_review_state(instance)
+
+
+@receiver(pre_save, sender=Review)
+@receiver(pre_delete, sender=Review)
+def review_before_change(sender, instance, **kwargs):
+    if not instance._state.adding:
+        load_review_state(instance)
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    """ Переносит изменение отзыва в рейтинг и счётчики произведения. """
+    added = [] if instance.score is None else [instance.score]
+    if created:
+        change_title_score(instance.title_id, added=added, reviews_delta=1)
+    elif (
+        instance._saved_score != instance.score
+        or instance._saved_title_id != instance.title_id
+    ):
+        removed = (
+            [] if instance._saved_score is None else [instance._saved_score])
+        if instance._saved_title_id == instance.title_id:
+            change_title_score(
+                instance.title_id, added=added, removed=removed)
+        else:
+            change_title_score(
+                instance._saved_title_id, removed=removed, reviews_delta=-1)
+            change_title_score(
+                instance.title_id, added=added, reviews_delta=1)
+    else:
+        touch_titles(pk=instance.title_id)
+    remember_review_state(instance)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    """
+    Убирает оценку удалённого отзыва из рейтинга и счётчиков произведения,
+    в том числе при каскадном удалении автора или произведения.
+    """
+    removed = [] if instance._saved_score is None else [instance._saved_score]
+    change_title_score(
+        instance._saved_title_id, removed=removed, reviews_delta=-1)
+
+
+@receiver(post_init, sender=Comment)
+def comment_loaded(sender, instance, **kwargs):
+    instance._saved_review_id = (
+        DEFERRED if 'review_id' in instance.get_deferred_fields()
+        else instance.__dict__.get('review_id'))
+
+
+@receiver(pre_save, sender=Comment)
+@receiver(pre_delete, sender=Comment)
+def comment_before_change(sender, instance, **kwargs):
+    if not instance._state.adding and instance._saved_review_id is DEFERRED:
+        instance._saved_review_id = Comment.objects.filter(
+            pk=instance.pk).values_list('review_id', flat=True).first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """ Новый или перенесённый комментарий меняет счётчики обоих отзывов. """
+    if created:
+        change_comments_count(instance.review_id, 1)
+    elif instance._saved_review_id != instance.review_id:
+        change_comments_count(instance._saved_review_id, -1)
+        change_comments_count(instance.review_id, 1)
+        touch_titles(reviews=instance._saved_review_id)
+    touch_titles(reviews=instance.review_id)
+    instance._saved_review_id = instance.review_id
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """
+    Уменьшает счётчик комментариев отзыва. Каскад шлёт post_delete на
+    каждый комментарий, так что это по UPDATE счётчика и modified на
+    комментарий; при удалении самого отзыва UPDATE счётчика просто не
+    найдёт строку.
+    """
+    change_comments_count(instance.review_id, -1)
+    touch_titles(reviews=instance.review_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    touch_titles(category=instance)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(pre_delete, sender=Genre)
+def genre_changed(sender, instance, **kwargs):
+    touch_titles(genre=instance)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def title_genres_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    """
+    Жанры меняют и со стороны произведения (title.genre.add), и со
+    стороны жанра (genre.title_set.add): тогда instance — жанр, а
+    произведения в pk_set. При очистке жанра pk_set пуст, поэтому его
+    произведения отмечаются до удаления связей.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_titles(pk=instance.pk)
+    elif action in ('post_add', 'post_remove'):
+        touch_titles(pk__in=pk_set)
+    elif action == 'pre_clear':
+        touch_titles(genre=instance)
+
+
+@receiver(post_init, sender=GenreTitle)
+def genre_title_loaded(sender, instance, **kwargs):
+    instance._saved_title_id = instance.__dict__.get('title_id')
+
+
+@receiver(post_save, sender=GenreTitle)
+@receiver(post_delete, sender=GenreTitle)
+def genre_title_changed(sender, instance, **kwargs):
+    """
+    Связь, сохранённая или удалённая напрямую, а не через title.genre:
+    при переносе на другое произведение меняются оба.
+    """
+    touch_titles(pk__in={instance._saved_title_id, instance.title_id})
+    instance._saved_title_id = instance.title_id
+
+
+@receiver(post_init, sender=User)
+def user_loaded(sender, instance, **kwargs):
+    instance._saved_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """ Имя автора выводится в отзывах и комментариях произведений. """
+    if not created and instance._saved_username != instance.username:
+        touch_titles(reviews__author=instance)
+        touch_titles(reviews__comments__author=instance)
+    instance._saved_username = instance.username
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    """ После миграций приложения reviews создаёт FTS-индекс произведений. """
+    if sender.name == 'reviews':
+        create_title_search_index(using)
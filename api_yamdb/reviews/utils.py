@@ -0,0 +1,156 @@
+from collections import Counter, defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (Case, Count, ExpressionWrapper, F, FloatField,
+                              IntegerField, OuterRef, Subquery, Sum, Value,
+                              When)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .leaderboards import refresh_title_leaderboards
+from .models import SCORES, Comment, Review, Title, score_field
+
+
+def rating_expression(score_sum, score_count):
+    """
+    SQL-выражение среднего по сумме и числу оценок, округлённого как
+    round() в Python — половина к чётному (7.5 → 8, 8.5 → 8). Считается
+    только целочисленным делением неотрицательных чисел, которое во всех
+    СУБД отбрасывает дробную часть.
+    """
+    doubled = score_sum * 2 + score_count
+    divisor = score_count * 2
+    half_up = doubled / divisor
+    remainder = doubled - half_up * divisor
+    is_tie = 1 - (remainder + divisor - 1) / divisor
+    is_odd = half_up - half_up / 2 * 2
+    return ExpressionWrapper(
+        half_up - is_tie * is_odd, output_field=IntegerField())
+
+
+def weighted_rating_expression(score_sum, score_count):
+    """
+    SQL-выражение байесовского среднего: оценки произведения смешаны
+    с априорными LEADERBOARD_PRIOR_WEIGHT оценками LEADERBOARD_PRIOR_SCORE.
+    """
+    weight = settings.LEADERBOARD_PRIOR_WEIGHT
+    return ExpressionWrapper(
+        (score_sum + settings.LEADERBOARD_PRIOR_SCORE * weight)
+        / (score_count + weight),
+        output_field=FloatField())
+
+
+def change_title_score(title_id, added=(), removed=(), reviews_delta=0):
+    """
+    Инкрементально меняет сумму и число оценок произведения, счётчики
+    гистограммы, рейтинги и число отзывов одним UPDATE-запросом:
+    `added` — оценки, которые появились, `removed` — которые исчезли.
+    После коммита обновляются лидерборды, где есть это произведение.
+    """
+    histogram = Counter(added)
+    histogram.subtract(removed)
+    count_delta = len(added) - len(removed)
+    score_sum = F('score_sum') + (sum(added) - sum(removed))
+    score_count = F('score_count') + count_delta
+    Title.objects.filter(pk=title_id).update(
+        score_sum=score_sum,
+        score_count=score_count,
+        reviews_count=F('reviews_count') + reviews_delta,
+        rating=Case(
+            When(score_count=-count_delta, then=Value(None)),
+            default=rating_expression(score_sum, score_count),
+        ),
+        weighted_rating=Case(
+            When(score_count=-count_delta, then=Value(None)),
+            default=weighted_rating_expression(score_sum, score_count),
+        ),
+        modified=timezone.now(),
+        **{
+            score_field(score): F(score_field(score)) + delta
+            for score, delta in histogram.items() if delta
+        },
+    )
+    if added or removed:
+        transaction.on_commit(partial(refresh_title_leaderboards, title_id))
+
+
+def add_review_scores(reviews):
+    """
+    Учитывает в рейтинге отзывы, созданные через bulk_create
+    (без сигналов): по одному UPDATE на каждое затронутое произведение.
+    """
+    by_title = defaultdict(list)
+    for review in reviews:
+        by_title[review.title_id].append(review)
+    for title_id, title_reviews in by_title.items():
+        change_title_score(
+            title_id,
+            added=[review.score for review in title_reviews
+                   if review.score is not None],
+            reviews_delta=len(title_reviews),
+        )
+
+
+def change_comments_count(review_id, delta):
+    """ Меняет счётчик комментариев отзыва без чтения строки. """
+    Review.objects.filter(pk=review_id).update(
+        comments_count=F('comments_count') + delta)
+
+
+def touch_titles(**lookups):
+    """
+    Обновляет дату изменения произведений, чьё представление
+    (сами данные, отзывы или комментарии) поменялось.
+    """
+    Title.objects.filter(**lookups).update(modified=timezone.now())
+
+
+def subquery_total(queryset, aggregate):
+    """ Агрегат по коррелированному подзапросу; 0, если строк нет. """
+    return Coalesce(
+        Subquery(queryset.annotate(total=aggregate).values('total')), 0)
+
+
+def recalculate_title_scores(titles=None):
+    """
+    Пересчитывает сумму, число оценок, гистограмму, рейтинги и число
+    отзывов произведений. Нужен после массовых операций, которые
+    не отправляют сигналы.
+    """
+    if titles is None:
+        titles = Title.objects.all()
+    reviews = Review.objects.filter(
+        title=OuterRef('pk')).order_by().values('title')
+    scores = reviews.filter(score__isnull=False)
+    titles.update(
+        reviews_count=subquery_total(reviews, Count('pk')),
+        score_sum=subquery_total(scores, Sum('score')),
+        score_count=subquery_total(scores, Count('pk')),
+        **{
+            score_field(score): subquery_total(
+                scores.filter(score=score), Count('pk'))
+            for score in SCORES
+        },
+    )
+    titles.update(
+        rating=Case(
+            When(score_count=0, then=Value(None)),
+            default=rating_expression(F('score_sum'), F('score_count')),
+        ),
+        weighted_rating=Case(
+            When(score_count=0, then=Value(None)),
+            default=weighted_rating_expression(
+                F('score_sum'), F('score_count')),
+        ),
+    )
+
+
+def recalculate_comment_counts(reviews=None):
+    """ Пересчитывает число комментариев отзывов по таблице комментариев. """
+    if reviews is None:
+        reviews = Review.objects.all()
+    comments = Comment.objects.filter(
+        review=OuterRef('pk')).order_by().values('review')
+    reviews.update(comments_count=subquery_total(comments, Count('pk')))
@@ -0,0 +1,134 @@
+import pytest
+
+from .common import auth_client, create_reviews
+
+
+class Test08TitleRating:
+
+    def get_rating(self, client, title_id):
+        response = client.get(f'/api/v1/titles/{title_id}/')
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/{title_id}/` возвращается статус 200'
+        )
+        return response.json().get('rating')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_rating_stored_on_title(self, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        from reviews.models import Title
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.score_sum, title.score_count, title.rating) == (12, 3, 4), (
+            'Проверьте, что при создании отзыва сумма, количество оценок '
+            'и `rating` произведения сохраняются в модели `Title`'
+        )
+        assert self.get_rating(admin_client, titles[1]['id']) is None, (
+            'Проверьте, что `rating` произведения без отзывов равен `None`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_rating_follows_review_changes(self, admin_client, admin):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        client_user = auth_client(user)
+        client_user.patch(
+            f'/api/v1/titles/{title_id}/reviews/{reviews[1]["id"]}/', data={'score': 9}
+        )
+        assert self.get_rating(admin_client, title_id) == 6, (
+            'Проверьте, что `rating` пересчитывается при изменении оценки отзыва'
+        )
+        client_user.patch(
+            f'/api/v1/titles/{title_id}/reviews/{reviews[1]["id"]}/', data={'text': 'Без оценки'}
+        )
+        assert self.get_rating(admin_client, title_id) == 6, (
+            'Проверьте, что `rating` не меняется при изменении текста отзыва'
+        )
+        admin_client.delete(f'/api/v1/titles/{title_id}/reviews/{reviews[2]["id"]}/')
+        assert self.get_rating(admin_client, title_id) == 7, (
+            'Проверьте, что `rating` пересчитывается при удалении отзыва'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_rating_after_cascade_delete(self, admin_client, admin):
+        reviews, titles, user, moderator = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        admin_client.delete(f'/api/v1/users/{moderator.username}/')
+        assert self.get_rating(admin_client, title_id) == 4, (
+            'Проверьте, что `rating` пересчитывается при удалении автора отзыва'
+        )
+        admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert self.get_rating(admin_client, title_id) == 5, (
+            'Проверьте, что `rating` пересчитывается при удалении автора отзыва'
+        )
+        admin.delete()
+        from reviews.models import Title
+        title = Title.objects.get(pk=title_id)
+        assert (title.score_sum, title.score_count, title.rating) == (0, 0, None), (
+            'Проверьте, что после удаления всех отзывов `rating` равен `None`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_recalculate_title_scores(self, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        from reviews.models import Title
+        from reviews.utils import recalculate_title_scores
+        Title.objects.update(score_sum=0, score_count=0, rating=None)
+        recalculate_title_scores()
+        title = Title.objects.get(pk=titles[0]['id'])
+        assert (title.score_sum, title.score_count, title.rating) == (12, 3, 4), (
+            'Проверьте, что `recalculate_title_scores` восстанавливает рейтинг по отзывам'
+        )
+        assert Title.objects.get(pk=titles[1]['id']).rating is None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_rating_rounds_half_to_even(self, admin, user, moderator):
+        from reviews.models import Review, Title
+        from reviews.utils import recalculate_title_scores
+        cases = ((7, 8), (8, 9), (1, 2), (9, 10), (1, 1), (6, 7, 9))
+        titles = []
+        for scores in cases:
+            title = Title.objects.create(name=f'Оценки {scores}', year=2000)
+            for author, score in zip((admin, user, moderator), scores):
+                Review.objects.create(title=title, author=author, text='.', score=score)
+            titles.append(title.pk)
+        expected = [round(sum(scores) / len(scores)) for scores in cases]
+        assert expected == [8, 8, 2, 10, 1, 7]
+        assert list(Title.objects.filter(pk__in=titles).order_by('pk').values_list(
+            'rating', flat=True)) == expected, (
+            'Проверьте, что `rating` округляется как `round()` в Python: половина — к чётному'
+        )
+        Title.objects.update(rating=None)
+        recalculate_title_scores()
+        assert list(Title.objects.filter(pk__in=titles).order_by('pk').values_list(
+            'rating', flat=True)) == expected
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_deferred_review_fields(self, admin, user):
+        from reviews.models import Comment, Review, Title
+        title = Title.objects.create(name='Отложенные поля', year=2000)
+        review = Review.objects.create(title=title, author=admin, text='.', score=7)
+        Review.objects.create(title=title, author=user, text='.', score=3)
+        comment = Comment.objects.create(review=review, author=user, text='.')
+
+        deferred = Review.objects.only('id', 'text').get(pk=review.pk)
+        deferred.text = 'Новый текст'
+        deferred.save(update_fields=['text'])
+        title.refresh_from_db()
+        assert (title.score_sum, title.score_count, title.score_7) == (10, 2, 1), (
+            'Проверьте, что сохранение отзыва, загруженного без `score`, '
+            'не меняет рейтинг и гистограмму произведения'
+        )
+        deferred = Comment.objects.only('id', 'text').get(pk=comment.pk)
+        deferred.save(update_fields=['text'])
+        review.refresh_from_db()
+        assert review.comments_count == 1, (
+            'Проверьте, что сохранение комментария, загруженного без `review`, '
+            'не меняет счётчик комментариев'
+        )
+
+        Review.objects.only('id').get(pk=review.pk).delete()
+        title.refresh_from_db()
+        assert (title.score_sum, title.score_count, title.score_7, title.reviews_count) == (
+            3, 1, 0, 1), (
+            'Проверьте, что удаление отзыва, загруженного без `score`, '
+            'убирает его оценку из рейтинга произведения'
+        )
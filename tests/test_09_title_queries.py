@@ -0,0 +1,55 @@
+import pytest
+
+
+def create_catalogue(count):
+    from reviews.models import Category, Genre, GenreTitle, Title
+    category = Category.objects.create(name='Фильм', slug='films')
+    genres = [
+        Genre.objects.create(name='Ужасы', slug='horror'),
+        Genre.objects.create(name='Комедия', slug='comedy'),
+    ]
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {i}', year=1900 + i % 100, category=category)
+        for i in range(count)
+    )
+    GenreTitle.objects.bulk_create(
+        GenreTitle(genre=genre, title=title)
+        for title in Title.objects.all()
+        for genre in genres
+    )
+    return Title.objects.first()
+
+
+class Test09TitleQueries:
+
+    @pytest.mark.parametrize('count', (5, 50, 500))
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_list_queries(self, client, django_assert_num_queries, count):
+        create_catalogue(count)
+        # COUNT(*) для пагинации, произведения с категориями, жанры
+        with django_assert_num_queries(3):
+            response = client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        title = response.json()['results'][0]
+        assert len(title['genre']) == 2 and title['category']['slug'] == 'films', (
+            'Проверьте, что при GET запросе `/api/v1/titles/` '
+            'возвращаются жанры и категория произведения'
+        )
+
+    @pytest.mark.parametrize('count', (5, 50, 500))
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_serializer_queries(self, django_assert_num_queries, count):
+        create_catalogue(count)
+        from api.serializers import TitleReadSerializer
+        from api.views import TitleViewSet
+        with django_assert_num_queries(2):
+            data = TitleReadSerializer(TitleViewSet.queryset.all(), many=True).data
+        assert len(data) == count
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_title_detail_queries(self, client, django_assert_num_queries):
+        title = create_catalogue(5)
+        # дата изменения для ETag, произведение с категорией, жанры
+        with django_assert_num_queries(3):
+            response = client.get(f'/api/v1/titles/{title.id}/')
+        assert response.status_code == 200
@@ -0,0 +1,128 @@
+import json
+from base64 import b64encode
+from urllib.parse import quote, urlencode
+
+import pytest
+
+from .common import create_reviews
+
+
+def create_titles_bulk(count):
+    from reviews.models import Title
+    Title.objects.bulk_create(
+        Title(name=f'Произведение {i}', year=2000 + i % 3) for i in range(count)
+    )
+    return list(
+        Title.objects.order_by('-year', 'id').values_list('id', flat=True)
+    )
+
+
+def crafted_cursor(position):
+    query = urlencode({'o': 0, 'r': 0, 'p': json.dumps(position)})
+    return quote(b64encode(query.encode()).decode())
+
+
+def walk(client, url, link='next'):
+    ids = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200, (
+            f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+        )
+        data = response.json()
+        assert 'count' not in data, (
+            'Проверьте, что keyset-пагинация не считает общее количество объектов'
+        )
+        ids.extend(item['id'] for item in data['results'])
+        url = data[link]
+    return ids
+
+
+class Test10KeysetPagination:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_page_number_is_default(self, client):
+        create_titles_bulk(7)
+        data = client.get('/api/v1/titles/').json()
+        assert data['count'] == 7 and len(data['results']) == 5, (
+            'Проверьте, что без параметра `cursor` используется постраничная пагинация'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_titles_cursor(self, client, django_assert_num_queries):
+        expected = create_titles_bulk(23)
+        ids = walk(client, '/api/v1/titles/?cursor=')
+        assert ids == expected, (
+            'Проверьте, что keyset-пагинация `/api/v1/titles/` обходит все '
+            'произведения по порядку `-year, id` без пропусков и повторов'
+        )
+        last = client.get('/api/v1/titles/?cursor=').json()['next']
+        for _ in range(3):
+            last = client.get(last).json()['next']
+        page = client.get(last).json()
+        backwards = walk(client, page['previous'], link='previous')
+        assert sorted(backwards) == sorted(expected[:20]), (
+            'Проверьте, что ссылка `previous` keyset-пагинации возвращает предыдущие страницы'
+        )
+        from django.core.cache import cache
+        cache.clear()
+        with django_assert_num_queries(2):
+            client.get(last)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_reviews_cursor(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/?cursor='
+        ids = walk(client, url)
+        assert sorted(ids) == sorted(review['id'] for review in reviews), (
+            'Проверьте, что keyset-пагинация работает для `/api/v1/titles/{title_id}/reviews/`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_users_cursor(self, admin_client, django_user_model):
+        for i in range(8):
+            django_user_model.objects.create_user(
+                username=f'user{i}', email=f'user{i}@yamdb.fake'
+            )
+        response = admin_client.get('/api/v1/users/?cursor=')
+        assert response.status_code == 200
+        usernames = []
+        url = '/api/v1/users/?cursor='
+        while url:
+            data = admin_client.get(url).json()
+            usernames.extend(item['username'] for item in data['results'])
+            url = data['next']
+        assert usernames == sorted(usernames) and len(usernames) == 9, (
+            'Проверьте, что keyset-пагинация `/api/v1/users/` идёт по `username`'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_invalid_cursor(self, client):
+        response = client.get('/api/v1/titles/?cursor=broken')
+        assert response.status_code == 404, (
+            'Проверьте, что при неверном курсоре возвращается статус 404'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_cursor_values_typed(self, client, admin_client, admin):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        for url, position in (
+            ('/api/v1/titles/', ['abc', 1]),
+            ('/api/v1/titles/', [[2000], {'id': 1}]),
+            (f'/api/v1/titles/{titles[0]["id"]}/reviews/', ['вчера', 1]),
+            (f'/api/v1/titles/{titles[0]["id"]}/reviews/', [20240101, 'x']),
+        ):
+            response = admin_client.get(f'{url}?cursor={crafted_cursor(position)}')
+            assert response.status_code == 404, (
+                'Проверьте, что курсор со значениями не того типа, что поля '
+                'сортировки, даёт статус 404, а не ошибку сервера'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_cursor_with_search_rejected(self, client):
+        create_titles_bulk(3)
+        response = client.get('/api/v1/titles/?search=Произведение&cursor=')
+        assert response.status_code == 400, (
+            'Проверьте, что keyset-пагинация не принимается вместе с поиском, '
+            'который сортирует по релевантности'
+        )
@@ -0,0 +1,51 @@
+import pytest
+
+
+def search(client, query):
+    response = client.get('/api/v1/titles/', {'search': query})
+    assert response.status_code == 200, (
+        'Проверьте, что при GET запросе `/api/v1/titles/?search=` возвращается статус 200'
+    )
+    return [title['name'] for title in response.json()['results']]
+
+
+class Test11TitleSearch:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_search_relevance(self, client):
+        from reviews.models import Title
+        Title.objects.create(name='Шляпа', year=2001, description='Про шляпу и дракона')
+        Title.objects.create(name='Дракон', year=2000, description='Дракон, дракон и ещё дракон')
+        Title.objects.create(name='Повесть', year=1999, description='Без чудовищ')
+        assert search(client, 'дракон') == ['Дракон', 'Шляпа'], (
+            'Проверьте, что `search` ищет по названию и описанию '
+            'и сортирует произведения по релевантности'
+        )
+        assert search(client, 'драк') == ['Дракон', 'Шляпа'], (
+            'Проверьте, что `search` ищет последнее слово по префиксу'
+        )
+        assert search(client, 'повесть "чудовищ') == ['Повесть'], (
+            'Проверьте, что `search` безопасно обрабатывает кавычки во вводе'
+        )
+        assert search(client, '---') == [] and search(client, '"') == [], (
+            'Проверьте, что `search` без единого слова не возвращает весь каталог'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_search_index_follows_writes(self, client):
+        from reviews.models import Title
+        title = Title.objects.create(name='Старое имя', year=2000)
+        title.name = 'Новое имя'
+        title.save()
+        assert search(client, 'старое') == [], (
+            'Проверьте, что индекс поиска обновляется при изменении произведения'
+        )
+        assert search(client, 'новое') == ['Новое имя']
+        Title.objects.bulk_create([Title(name='Массовая запись', year=2000)])
+        assert search(client, 'массовая') == ['Массовая запись'], (
+            'Проверьте, что индекс поиска обновляется при bulk_create'
+        )
+        title.delete()
+        assert search(client, 'новое') == [], (
+            'Проверьте, что индекс поиска обновляется при удалении произведения'
+        )
@@ -0,0 +1,64 @@
+import pytest
+from django.db import transaction
+
+from reviews.models import Category
+
+from .common import auth_client, create_titles, create_users_api
+
+
+class Test12CatalogueCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_cached_reads(self, client, admin_client, django_assert_num_queries):
+        create_titles(admin_client)
+        for url in ('/api/v1/categories/', '/api/v1/genres/', '/api/v1/titles/?year=2000'):
+            first = client.get(url)
+            with django_assert_num_queries(0):
+                second = client.get(url)
+            assert second.json() == first.json(), (
+                f'Проверьте, что повторный GET запрос `{url}` отдаётся из кэша'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_writes_invalidate_cache(self, client, admin_client):
+        titles, _, _ = create_titles(admin_client)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        assert client.get('/api/v1/categories/').json()['count'] == 2
+        assert client.get(title_url).json()['rating'] is None
+
+        admin_client.post('/api/v1/categories/', data={'name': 'Музыка', 'slug': 'music'})
+        assert client.get('/api/v1/categories/').json()['count'] == 3, (
+            'Проверьте, что создание категории сбрасывает кэш `/api/v1/categories/`'
+        )
+
+        user, _ = create_users_api(admin_client)
+        auth_client(user).post(f'{title_url}reviews/', data={'text': 'Ок', 'score': 8})
+        assert client.get(title_url).json()['rating'] == 8, (
+            'Проверьте, что новый отзыв сбрасывает кэш произведения'
+        )
+
+        admin_client.patch(title_url, data={'genre': ['drama']})
+        genres = [genre['slug'] for genre in client.get(title_url).json()['genre']]
+        assert genres == ['drama'], (
+            'Проверьте, что изменение жанров произведения сбрасывает его кэш'
+        )
+
+        admin_client.delete('/api/v1/categories/films/')
+        assert client.get(title_url).json()['category'] is None, (
+            'Проверьте, что удаление категории сбрасывает кэш произведений'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_rolled_back_write_keeps_cache(self, client, admin_client):
+        create_titles(admin_client)
+        url = '/api/v1/categories/'
+        before = client.get(url).json()
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                Category.objects.create(name='Призрак', slug='ghost')
+                client.get(url)
+                raise RuntimeError
+        assert client.get(url).json() == before, (
+            'Проверьте, что версия кэша повышается после коммита: GET внутри '
+            'откатившейся транзакции не должен подменить закэшированный список'
+        )
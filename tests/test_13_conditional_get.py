@@ -0,0 +1,67 @@
+import pytest
+
+from .common import auth_client, create_reviews
+
+
+class Test13ConditionalGet:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_etag_not_modified(self, client, admin_client, admin, django_assert_num_queries):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        urls = (
+            f'/api/v1/titles/{title_id}/',
+            f'/api/v1/titles/{title_id}/reviews/',
+            f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/',
+            f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/comments/',
+        )
+        for url in urls:
+            response = client.get(url)
+            etag = response.get('ETag')
+            assert etag and response.get('Last-Modified'), (
+                f'Проверьте, что GET запрос `{url}` возвращает заголовки ETag и Last-Modified'
+            )
+            with django_assert_num_queries(1):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert response.status_code == 304, (
+                f'Проверьте, что GET запрос `{url}` с актуальным If-None-Match возвращает статус 304'
+            )
+            assert response.get('ETag') == etag and not response.content
+            response = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            assert response.status_code == 304, (
+                f'Проверьте, что GET запрос `{url}` с актуальным If-Modified-Since возвращает статус 304'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_etag_changes_on_write(self, client, admin_client, admin):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        reviews_url = f'/api/v1/titles/{title_id}/reviews/'
+        comments_url = f'{reviews_url}{reviews[0]["id"]}/comments/'
+        writes = (
+            lambda: auth_client(user).patch(f'{reviews_url}{reviews[1]["id"]}/', data={'text': 'Новый текст'}),
+            lambda: admin_client.post(comments_url, data={'text': 'Комментарий'}),
+            lambda: admin_client.patch(f'/api/v1/titles/{title_id}/', data={'genre': ['drama']}),
+            lambda: admin_client.patch(f'/api/v1/users/{user.username}/', data={'username': 'Renamed'}),
+        )
+        for write in writes:
+            etags = [client.get(url)['ETag'] for url in (reviews_url, comments_url)]
+            write()
+            for url, etag in zip((reviews_url, comments_url), etags):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                assert response.status_code == 200, (
+                    f'Проверьте, что после изменения данных GET запрос `{url}` '
+                    'со старым ETag возвращает статус 200'
+                )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_missing_title(self, client):
+        response = client.get('/api/v1/titles/999/reviews/', HTTP_IF_NONE_MATCH='"x"')
+        assert response.status_code == 404
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_non_numeric_title_id(self, client):
+        response = client.get('/api/v1/titles/abc/')
+        assert response.status_code == 404, (
+            'Проверьте, что GET запрос произведения с нечисловым id возвращает 404'
+        )
@@ -0,0 +1,248 @@
+import csv
+import os
+
+import pytest
+from django.core.management import call_command
+
+from .conftest import MANAGE_PATH
+
+DATA_DIR = os.path.join(MANAGE_PATH, 'static', 'data')
+
+
+def csv_count(name):
+    with open(os.path.join(DATA_DIR, f'{name}.csv'), encoding='utf-8-sig') as file:
+        return sum(1 for _ in csv.DictReader(file))
+
+
+class Test14CsvLoad:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_bulk_load(self, capsys):
+        from reviews.management.commands.csv_load import CSV_MODEL
+        from reviews.models import Review, Title
+        call_command('csv_load', '--bulk', '--batch-size', '7')
+        for name, model in CSV_MODEL.items():
+            assert model.objects.count() == csv_count(name), (
+                f'Проверьте, что `csv_load --bulk` загружает все строки `{name}.csv`'
+            )
+        output = capsys.readouterr().out
+        assert all(f'{name}:' in output for name in CSV_MODEL), (
+            'Проверьте, что `csv_load --bulk` выводит скорость загрузки каждого CSV'
+        )
+        title = Title.objects.filter(reviews__isnull=False).first()
+        assert title.score_count == Review.objects.filter(title=title).count(), (
+            'Проверьте, что после `csv_load --bulk` пересчитан рейтинг произведений'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_bulk_load_twice_and_truncate(self, admin):
+        from reviews.management.commands.csv_load import CSV_MODEL
+        call_command('csv_load', '--bulk')
+        call_command('csv_load', '--bulk')
+        for name, model in CSV_MODEL.items():
+            if name != 'users':
+                assert model.objects.count() == csv_count(name), (
+                    'Проверьте, что повторный `csv_load --bulk` не создаёт дубликаты'
+                )
+        call_command('csv_load', '--bulk', '--truncate')
+        for name, model in CSV_MODEL.items():
+            if name != 'users':
+                assert model.objects.count() == csv_count(name)
+        from reviews.models import User
+        assert User.objects.filter(pk=admin.pk).exists() is False
+        assert User.objects.count() == csv_count('users')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_incremental_load(self, tmp_path, capsys):
+        import shutil
+        from reviews.management.commands import csv_load
+        from reviews.models import Comment, Review, Title
+        data_dir = tmp_path / 'static' / 'data'
+        shutil.copytree(DATA_DIR, data_dir)
+        old_dir = csv_load.DIR
+        csv_load.DIR = str(tmp_path)
+        try:
+            call_command('csv_load', '--incremental')
+            for name, model in csv_load.CSV_MODEL.items():
+                assert model.objects.count() == csv_count(name), (
+                    f'Проверьте, что `csv_load --incremental` загружает все строки `{name}.csv`'
+                )
+            capsys.readouterr()
+            call_command('csv_load', '--incremental')
+            output = capsys.readouterr().out
+            assert 'добавлено 0, обновлено 0' in output and 'обновлено 1' not in output, (
+                'Проверьте, что повторный `csv_load --incremental` ничего не меняет'
+            )
+
+            review_path = data_dir / 'review.csv'
+            with open(review_path, encoding='utf-8-sig') as file:
+                rows = list(csv.DictReader(file))
+            fieldnames = list(rows[0].keys())
+            changed, removed = rows[0], rows[1]
+            changed['score'] = '1' if changed['score'] != '1' else '2'
+            rows.remove(removed)
+            with open(review_path, 'w', encoding='utf-8-sig', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+
+            call_command('csv_load', '--incremental', '--delete-missing')
+            output = capsys.readouterr().out
+            assert 'review: добавлено 0, обновлено 1' in output, (
+                'Проверьте, что `csv_load --incremental` обновляет только изменившиеся строки'
+            )
+            assert Review.objects.get(pk=changed['id']).score == int(changed['score'])
+            assert not Review.objects.filter(pk=removed['id']).exists(), (
+                'Проверьте, что `--delete-missing` удаляет пропавшие из CSV строки'
+            )
+            assert not Comment.objects.filter(review_id=removed['id']).exists()
+            title = Title.objects.get(pk=changed['title_id'])
+            assert title.score_count == Review.objects.filter(title=title).count(), (
+                'Проверьте, что после инкрементальной загрузки пересчитан рейтинг'
+            )
+        finally:
+            csv_load.DIR = old_dir
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_parallel_load(self, capsys):
+        from reviews.management.commands.csv_load import CSV_MODEL
+        from reviews.models import Review, Title
+        call_command('csv_load', '--parallel', '--workers', '3', '--batch-size', '10', '--queue-size', '1')
+        for name, model in CSV_MODEL.items():
+            assert model.objects.count() == csv_count(name), (
+                f'Проверьте, что `csv_load --parallel` загружает все строки `{name}.csv`'
+            )
+        output = capsys.readouterr().out
+        assert 'Всего:' in output, (
+            'Проверьте, что `csv_load --parallel` выводит общую скорость загрузки'
+        )
+        title = Title.objects.filter(reviews__isnull=False).first()
+        assert title.score_count == Review.objects.filter(title=title).count()
+
+    @pytest.mark.parametrize('compress', (False, True))
+    @pytest.mark.django_db(transaction=True)
+    def test_05_export_round_trip(self, tmp_path, compress):
+        from reviews.management.commands.csv_export import CSV_HEADERS
+        from reviews.management.commands.csv_load import CSV_MODEL, read_rows
+        call_command('csv_load', '--bulk')
+        options = ['--output-dir', str(tmp_path), '--chunk-size', '5']
+        if compress:
+            options.append('--gzip')
+        call_command('csv_export', *options)
+        suffix = '.csv.gz' if compress else '.csv'
+        for name in CSV_MODEL:
+            assert (tmp_path / f'{name}{suffix}').exists(), (
+                f'Проверьте, что `csv_export` пишет файл `{name}{suffix}`'
+            )
+            exported = list(read_rows(name, str(tmp_path)))
+            original = sorted(read_rows(name), key=lambda row: int(row['id']))
+            assert list(exported[0].keys()) == list(CSV_HEADERS[name]) == list(original[0].keys()), (
+                f'Проверьте, что `csv_export` пишет `{name}` с заголовками исходного CSV'
+            )
+            columns = [column for column in CSV_HEADERS[name] if column != 'pub_date']
+            assert (
+                [[row[column] for column in columns] for row in exported]
+                == [[row[column] for column in columns] for row in original]
+            ), f'Проверьте, что `csv_export` выгружает все строки `{name}`'
+
+        for model in reversed(list(CSV_MODEL.values())):
+            model.objects.all().delete()
+        call_command('csv_load', '--bulk', '--data-dir', str(tmp_path))
+        for name, model in CSV_MODEL.items():
+            assert model.objects.count() == csv_count(name), (
+                'Проверьте, что выгрузка `csv_export` загружается обратно через `csv_load`'
+            )
+
+    @pytest.mark.parametrize('mode', ((), ('--bulk',), ('--incremental',), ('--parallel', '--workers', '2')))
+    @pytest.mark.django_db(transaction=True)
+    def test_06_null_score_round_trip(self, tmp_path, mode):
+        from reviews.management.commands.csv_load import CSV_MODEL
+        from reviews.models import Review, Title
+        call_command('csv_load', '--bulk')
+        review = Review.objects.order_by('pk').first()
+        Review.objects.filter(pk=review.pk).update(score=None)
+        call_command('csv_export', '--output-dir', str(tmp_path))
+
+        for model in reversed(list(CSV_MODEL.values())):
+            model.objects.all().delete()
+        call_command('csv_load', *mode, '--data-dir', str(tmp_path))
+        assert Review.objects.count() == csv_count('review'), (
+            f'Проверьте, что `csv_load {" ".join(mode)}` загружает выгрузку с отзывом без оценки'
+        )
+        assert Review.objects.get(pk=review.pk).score is None
+        title = Title.objects.get(pk=review.title_id)
+        assert title.score_count == Review.objects.filter(
+            title=title, score__isnull=False).count()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_incremental_moves_update_old_parents(self, tmp_path):
+        import shutil
+        from reviews.models import Comment, Review, Title
+        data_dir = tmp_path / 'data'
+        shutil.copytree(DATA_DIR, data_dir)
+        call_command('csv_load', '--incremental', '--data-dir', str(data_dir))
+
+        def rewrite(name, change):
+            path = data_dir / f'{name}.csv'
+            with open(path, encoding='utf-8-sig') as file:
+                rows = list(csv.DictReader(file))
+            change(rows)
+            with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+                writer.writeheader()
+                writer.writerows(rows)
+
+        review = Review.objects.filter(score__isnull=False).order_by('pk').first()
+        old_title_id = review.title_id
+        new_title = Title.objects.exclude(pk=old_title_id).exclude(
+            reviews__author_id=review.author_id).order_by('pk').first()
+        comment = Comment.objects.order_by('pk').first()
+        old_review_id = comment.review_id
+        new_review = Review.objects.exclude(pk=old_review_id).order_by('pk').first()
+
+        def move_review(rows):
+            next(row for row in rows if int(row['id']) == review.pk)['title_id'] = str(new_title.pk)
+
+        def move_comment(rows):
+            next(row for row in rows if int(row['id']) == comment.pk)['review_id'] = str(new_review.pk)
+
+        rewrite('review', move_review)
+        rewrite('comments', move_comment)
+        call_command('csv_load', '--incremental', '--data-dir', str(data_dir))
+
+        old_title = Title.objects.get(pk=old_title_id)
+        assert old_title.score_count == Review.objects.filter(
+            title=old_title, score__isnull=False).count(), (
+            'Проверьте, что при переносе отзыва `csv_load --incremental` '
+            'пересчитывает и прежнее произведение'
+        )
+        assert old_title.reviews_count == Review.objects.filter(title=old_title).count()
+        old_review = Review.objects.get(pk=old_review_id)
+        assert old_review.comments_count == Comment.objects.filter(review=old_review).count(), (
+            'Проверьте, что при переносе комментария пересчитывается и прежний отзыв'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_08_incremental_malformed_keys(self, tmp_path, capsys):
+        import shutil
+        from reviews.models import Review
+        data_dir = tmp_path / 'data'
+        shutil.copytree(DATA_DIR, data_dir)
+        path = data_dir / 'review.csv'
+        with open(path, encoding='utf-8-sig') as file:
+            rows = list(csv.DictReader(file))
+        rows[0]['title_id'] = 'abc'
+        rows[1]['id'] = 'x'
+        with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        call_command('csv_load', '--incremental', '--data-dir', str(data_dir))
+        line = next(
+            line for line in capsys.readouterr().out.splitlines() if line.startswith('review:'))
+        assert line.startswith(f'review: добавлено {len(rows) - 2},') and (
+            'пропущено 2 ' in line), (
+            'Проверьте, что `csv_load --incremental` пропускает строки с нечисловым '
+            'id или внешним ключом и учитывает их в числе пропущенных'
+        )
+        assert not Review.objects.filter(pk=rows[0]['id']).exists()
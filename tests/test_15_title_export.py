@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from reviews.models import Title
+
+from .common import create_reviews
+
+
+def read_lines(response):
+    body = b''.join(response.streaming_content).decode()
+    return [json.loads(line) for line in body.splitlines()]
+
+
+class Test15TitleExport:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_export_not_auth(self, client):
+        response = client.get('/api/v1/titles/export/')
+        assert response.status_code == 401, (
+            'Проверьте, что `/api/v1/titles/export/` недоступен без токена авторизации'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_export_ndjson(self, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        from api.views import TitleViewSet
+        TitleViewSet.export_chunk_size = 1
+        try:
+            response = admin_client.get('/api/v1/titles/export/')
+            assert response.status_code == 200
+            assert response['Content-Type'].startswith('application/x-ndjson'), (
+                'Проверьте, что `/api/v1/titles/export/` отдаёт NDJSON'
+            )
+            lines = read_lines(response)
+        finally:
+            TitleViewSet.export_chunk_size = 200
+        assert [line['id'] for line in lines] == sorted(title['id'] for title in titles)
+        first = lines[0]
+        assert first['rating'] == 4 and first['category']['slug'] == 'films', (
+            'Проверьте, что строка выгрузки содержит рейтинг и категорию произведения'
+        )
+        assert len(first['genre']) == 2 and len(first['reviews']) == len(reviews), (
+            'Проверьте, что строка выгрузки содержит жанры и отзывы произведения'
+        )
+        assert first['reviews'][0]['author'] == admin.username
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_export_since(self, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        response = admin_client.get('/api/v1/titles/export/')
+        read_lines(response)
+        since = response['X-Export-Watermark']
+        admin_client.patch(f'/api/v1/titles/{titles[1]["id"]}/', data={'name': 'Обновлено'})
+        lines = read_lines(admin_client.get('/api/v1/titles/export/', {'since': since}))
+        assert [line['name'] for line in lines] == ['Обновлено'], (
+            'Проверьте, что параметр `since` оставляет только изменившиеся произведения'
+        )
+        response = admin_client.get('/api/v1/titles/export/', {'since': 'вчера'})
+        assert response.status_code == 400
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_watermark_taken_before_reading(self, admin_client, admin):
+        _, titles, _, _ = create_reviews(admin_client, admin)
+        response = admin_client.get('/api/v1/titles/export/')
+        since = response['X-Export-Watermark']
+        # Изменение во время выгрузки, до того как её строки прочитаны.
+        title = Title.objects.get(pk=titles[0]['id'])
+        title.name = 'Во время выгрузки'
+        title.save()
+        read_lines(response)
+        lines = read_lines(admin_client.get('/api/v1/titles/export/', {'since': since}))
+        assert [line['name'] for line in lines] == ['Во время выгрузки'], (
+            'Проверьте, что выгрузка от метки X-Export-Watermark возвращает произведения, '
+            'изменённые во время прошлой выгрузки'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_all_reviews_in_chunks(self, admin_client, admin):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from api.views import TitleViewSet
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        TitleViewSet.export_chunk_size = 2
+        TitleViewSet.export_reviews_chunk_size = 1
+        try:
+            with CaptureQueriesContext(connection) as context:
+                lines = read_lines(admin_client.get('/api/v1/titles/export/'))
+        finally:
+            TitleViewSet.export_chunk_size = 200
+            TitleViewSet.export_reviews_chunk_size = 1000
+        by_id = {line['id']: line for line in lines}
+        assert [review['id'] for review in by_id[titles[0]['id']]['reviews']] == [
+            review['id'] for review in reviews], (
+            'Проверьте, что строка выгрузки содержит все отзывы произведения по порядку'
+        )
+        assert all(not by_id[title['id']]['reviews'] for title in titles[1:])
+        review_queries = [
+            query['sql'] for query in context.captured_queries
+            if 'FROM "reviews_review"' in query['sql']]
+        assert review_queries and all(
+            '"reviews_review"."text"' in sql and '"reviews_user"."bio"' not in sql
+            for sql in review_queries), (
+            'Проверьте, что отзывы выгрузки читаются кусками с одним username автора'
+        )
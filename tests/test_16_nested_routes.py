@@ -0,0 +1,49 @@
+import pytest
+
+from .common import auth_client, create_reviews, create_titles, create_users_api
+
+
+class Test16NestedRoutes:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_review_create_queries(self, admin_client, django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        user, _ = create_users_api(admin_client)
+        client_user = auth_client(user)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        # пользователь, произведение, BEGIN, INSERT отзыва, UPDATE рейтинга,
+        # категория и жанры произведения для лидербордов после коммита
+        with django_assert_num_queries(6):
+            response = client_user.post(url, data={'text': 'Норм', 'score': 6})
+        assert response.status_code == 201
+        response = client_user.post(url, data={'text': 'Ещё раз', 'score': 2})
+        assert response.status_code == 400, (
+            'Проверьте, что повторный отзыв на то же произведение возвращает статус 400'
+        )
+        assert 'non_field_errors' in response.json()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_review_list_queries(self, client, admin_client, admin, django_assert_num_queries):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/'
+        # произведение (и для ETag, и как родитель), COUNT, отзывы с авторами
+        with django_assert_num_queries(3):
+            response = client.get(url)
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_comment_parent_chain(self, client, admin_client, admin):
+        reviews, titles, _, _ = create_reviews(admin_client, admin)
+        url = f'/api/v1/titles/{titles[1]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        response = client.get(url)
+        assert response.status_code == 404, (
+            'Проверьте, что комментарии отзыва, не относящегося к произведению из URL, '
+            'возвращают статус 404'
+        )
+        response = admin_client.post(url, data={'text': 'Не туда'})
+        assert response.status_code == 404, (
+            'Проверьте, что нельзя комментировать отзыв через чужое произведение'
+        )
+        url = f'/api/v1/titles/{titles[0]["id"]}/reviews/{reviews[0]["id"]}/comments/'
+        response = admin_client.post(url, data={'text': 'Туда'})
+        assert response.status_code == 201
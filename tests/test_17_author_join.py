@@ -0,0 +1,52 @@
+import pytest
+
+
+def create_discussion(count, django_user_model):
+    from reviews.models import Comment, Review, Title
+    title = Title.objects.create(name='Произведение', year=2000)
+    authors = [
+        django_user_model.objects.create_user(
+            username=f'author{i}', email=f'author{i}@yamdb.fake', bio='Длинная биография ' * 50
+        )
+        for i in range(count)
+    ]
+    reviews = Review.objects.bulk_create(
+        Review(title=title, author=author, text='Отзыв', score=5) for author in authors
+    )
+    review = Review.objects.filter(title=title).first()
+    Comment.objects.bulk_create(
+        Comment(review=review, author=author, text='Комментарий') for author in authors
+    )
+    return title, review
+
+
+class Test17AuthorJoin:
+
+    @pytest.mark.parametrize('count', (1, 5, 40))
+    @pytest.mark.django_db(transaction=True)
+    def test_01_review_list_queries(self, client, django_user_model, django_assert_num_queries, count):
+        title, review = create_discussion(count, django_user_model)
+        reviews_url = f'/api/v1/titles/{title.id}/reviews/'
+        comments_url = f'{reviews_url}{review.id}/comments/'
+        for url in (reviews_url, comments_url):
+            # родитель (он же источник ETag), COUNT, объекты с авторами
+            with django_assert_num_queries(3) as context:
+                response = client.get(url)
+            assert response.status_code == 200
+            authors = [item['author'] for item in response.json()['results']]
+            assert len(authors) == min(count, 5) and all(authors), (
+                f'Проверьте, что `{url}` отдаёт username авторов'
+            )
+            assert all('"bio"' not in query['sql'] for query in context.captured_queries), (
+                f'Проверьте, что `{url}` не загружает лишние поля авторов'
+            )
+            # родитель, объекты с авторами — без COUNT
+            with django_assert_num_queries(2):
+                client.get(f'{url}?cursor=')
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_review_detail_queries(self, client, django_user_model, django_assert_num_queries):
+        title, review = create_discussion(3, django_user_model)
+        with django_assert_num_queries(2):
+            response = client.get(f'/api/v1/titles/{title.id}/reviews/{review.id}/')
+        assert response.json()['author'] == review.author.username
@@ -0,0 +1,59 @@
+import pytest
+
+from .common import auth_client, create_titles, create_users_api
+
+
+class Test18ReviewBatch:
+    url = '/api/v1/reviews/batch/'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_batch_create(self, client, admin_client, django_assert_num_queries):
+        titles, _, _ = create_titles(admin_client)
+        user, _ = create_users_api(admin_client)
+        client_user = auth_client(user)
+        data = [
+            {'title': titles[0]['id'], 'text': 'Хорошо', 'score': 8},
+            {'title': titles[1]['id'], 'text': 'Плохо', 'score': 3},
+            {'title': titles[0]['id'], 'text': 'Снова', 'score': 1},
+            {'title': 999999, 'text': 'Нет такого', 'score': 5},
+            {'title': titles[1]['id'], 'text': 'Без оценки', 'score': 11},
+        ]
+        response = client.post(self.url, data=data, content_type='application/json')
+        assert response.status_code == 401, (
+            f'Проверьте, что `{self.url}` недоступен анониму'
+        )
+        # пользователь, проверка пакета, BEGIN, INSERT, id отзывов,
+        # UPDATE рейтинга двух произведений и их лидерборды после коммита
+        with django_assert_num_queries(9):
+            response = client_user.post(self.url, data=data, format='json')
+        assert response.status_code == 201
+        results = response.json()['results']
+        assert [item['status'] for item in results] == [
+            'created', 'created', 'error', 'error', 'error'
+        ], f'Проверьте, что `{self.url}` возвращает результат по каждому отзыву'
+        assert response.json()['created'] == 2
+        assert results[0]['review']['id'] and results[0]['review']['author'] == user.username
+        assert 'non_field_errors' in results[2]['errors']
+        assert 'title' in results[3]['errors'] and 'score' in results[4]['errors']
+
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/')
+        assert response.json()['rating'] == 8, (
+            'Проверьте, что пакетная отправка пересчитывает рейтинг произведений'
+        )
+        response = client.get(f'/api/v1/titles/{titles[0]["id"]}/reviews/')
+        assert response.json()['count'] == 1
+
+        response = client_user.post(self.url, data=data[:2], format='json')
+        assert response.status_code == 400, (
+            f'Проверьте, что `{self.url}` возвращает 400, если не создан ни один отзыв'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_batch_limits(self, admin_client, settings):
+        settings.REVIEW_BATCH_MAX_SIZE = 2
+        titles, _, _ = create_titles(admin_client)
+        data = [{'title': titles[0]['id'], 'text': 'Текст', 'score': 5}] * 3
+        response = admin_client.post(self.url, data=data, format='json')
+        assert response.status_code == 400
+        response = admin_client.post(self.url, data={'title': 1}, format='json')
+        assert response.status_code == 400
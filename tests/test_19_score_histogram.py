@@ -0,0 +1,73 @@
+import pytest
+
+from .common import auth_client, create_reviews
+
+
+def empty_histogram(**counts):
+    histogram = {str(score): 0 for score in range(1, 11)}
+    histogram.update({score.lstrip('_'): count for score, count in counts.items()})
+    return histogram
+
+
+class Test19ScoreHistogram:
+
+    def get_stats(self, client, title_id):
+        response = client.get(f'/api/v1/titles/{title_id}/stats/')
+        assert response.status_code == 200, (
+            'Проверьте, что при GET запросе `/api/v1/titles/{title_id}/stats/` '
+            'возвращается статус 200'
+        )
+        return response.json()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_histogram_follows_reviews(self, client, admin_client, admin, django_assert_num_queries):
+        reviews, titles, user, _ = create_reviews(admin_client, admin)
+        title_id = titles[0]['id']
+        with django_assert_num_queries(1):
+            stats = self.get_stats(client, title_id)
+        assert stats == {
+            'id': title_id, 'rating': 4, 'score_count': 3,
+            'scores': empty_histogram(_3=1, _4=1, _5=1),
+        }, 'Проверьте, что гистограмма оценок учитывает созданные отзывы'
+        assert self.get_stats(client, titles[1]['id'])['scores'] == empty_histogram()
+
+        client_user = auth_client(user)
+        url = f'/api/v1/titles/{title_id}/reviews/{reviews[1]["id"]}/'
+        client_user.patch(url, data={'score': 9})
+        assert self.get_stats(client, title_id)['scores'] == empty_histogram(_4=1, _5=1, _9=1), (
+            'Проверьте, что гистограмма пересчитывается при изменении оценки'
+        )
+        client_user.patch(url, data={'score': None}, format='json')
+        stats = self.get_stats(client, title_id)
+        assert stats['scores'] == empty_histogram(_4=1, _5=1) and stats['score_count'] == 2, (
+            'Проверьте, что отзыв без оценки не попадает в гистограмму'
+        )
+        admin_client.delete(f'/api/v1/titles/{title_id}/reviews/{reviews[0]["id"]}/')
+        assert self.get_stats(client, title_id)['scores'] == empty_histogram(_4=1), (
+            'Проверьте, что гистограмма пересчитывается при удалении отзыва'
+        )
+
+        from reviews.models import Title
+        from reviews.utils import recalculate_title_scores
+        Title.objects.update(score_4=0, score_7=5)
+        recalculate_title_scores()
+        assert self.get_stats(client, title_id)['scores'] == empty_histogram(_4=1), (
+            'Проверьте, что `recalculate_title_scores` восстанавливает гистограмму'
+        )
+
+    def test_02_histogram_matches_validators(self):
+        from django.core.validators import MaxValueValidator, MinValueValidator
+        from reviews.models import SCORES, Review, Title, score_field
+        validators = Review._meta.get_field('score').validators
+        limits = {type(validator): validator.limit_value for validator in validators}
+        assert (limits[MinValueValidator], limits[MaxValueValidator]) == (SCORES[0], SCORES[-1])
+        assert Review._meta.get_field('score').null
+        for score in SCORES:
+            assert Title._meta.get_field(score_field(score)).default == 0
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_stats_non_numeric_id(self, client):
+        response = client.get('/api/v1/titles/abc/stats/')
+        assert response.status_code == 404, (
+            'Проверьте, что статистика произведения с нечисловым id возвращает 404'
+        )
@@ -0,0 +1,83 @@
+import pytest
+from django.core.management import call_command
+
+from .common import create_comments
+
+
+class Test20Counters:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_counters_follow_changes(self, client, admin_client, admin):
+        comments, reviews, titles, user, _ = create_comments(admin_client, admin)
+        title_url = f'/api/v1/titles/{titles[0]["id"]}/'
+        review_url = f'{title_url}reviews/{reviews[0]["id"]}/'
+        assert client.get(title_url).json()['reviews_count'] == 3, (
+            'Проверьте, что в ответе на GET запрос `/api/v1/titles/{title_id}/` '
+            'есть число отзывов `reviews_count`'
+        )
+        assert client.get(review_url).json()['comments_count'] == 3, (
+            'Проверьте, что в ответе на GET запрос отзыва есть число комментариев `comments_count`'
+        )
+        response = client.get(f'{title_url}reviews/')
+        assert {item['comments_count'] for item in response.json()['results']} == {0, 3}
+
+        admin_client.delete(f'{review_url}comments/{comments[0]["id"]}/')
+        assert client.get(review_url).json()['comments_count'] == 2, (
+            'Проверьте, что `comments_count` уменьшается при удалении комментария'
+        )
+        # каскадно удаляются отзыв и комментарий пользователя
+        admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert client.get(review_url).json()['comments_count'] == 1, (
+            'Проверьте, что счётчики учитывают каскадное удаление автора'
+        )
+        assert client.get(title_url).json()['reviews_count'] == 2
+        admin_client.delete(review_url)
+        assert client.get(title_url).json()['reviews_count'] == 1
+
+    @pytest.mark.parametrize('workers', (1, 2))
+    @pytest.mark.django_db(transaction=True)
+    def test_02_repair_counters(self, client, admin_client, admin, workers):
+        _, reviews, titles, _, _ = create_comments(admin_client, admin)
+        from reviews.models import Review, Title
+        Title.objects.update(reviews_count=7, score_sum=0, score_count=0, rating=None)
+        Review.objects.update(comments_count=5)
+        call_command('repair_counters', chunk_size=1, workers=workers)
+        title = client.get(f'/api/v1/titles/{titles[0]["id"]}/').json()
+        assert (title['reviews_count'], title['rating']) == (3, 4), (
+            'Проверьте, что команда `repair_counters` восстанавливает счётчики произведений'
+        )
+        assert client.get(f'/api/v1/titles/{titles[1]["id"]}/').json()['reviews_count'] == 0
+        assert sorted(Review.objects.values_list('comments_count', flat=True)) == [0, 0, 3], (
+            'Проверьте, что команда `repair_counters` восстанавливает счётчики отзывов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_moves_update_old_parents(self, admin_client, admin):
+        from reviews.models import Comment, Genre, GenreTitle, Review, Title
+        comments, reviews, titles, _, _ = create_comments(admin_client, admin)
+        old_review = Review.objects.get(pk=reviews[0]['id'])
+        new_review = Review.objects.exclude(pk=old_review.pk).first()
+        comment = Comment.objects.get(pk=comments[0]['id'])
+        comment.review = new_review
+        comment.save()
+        assert Review.objects.get(pk=old_review.pk).comments_count == 2, (
+            'Проверьте, что при переносе комментария уменьшается счётчик прежнего отзыва'
+        )
+        assert Review.objects.get(pk=new_review.pk).comments_count == new_review.comments_count + 1
+
+        link = GenreTitle.objects.filter(title_id=titles[0]['id']).first()
+        other = Title.objects.exclude(pk=titles[0]['id']).exclude(genre=link.genre_id).first()
+        before = Title.objects.get(pk=titles[0]['id']).modified
+        link.title = other
+        link.save()
+        assert Title.objects.get(pk=titles[0]['id']).modified > before, (
+            'Проверьте, что перенос связи жанра обновляет `modified` прежнего произведения'
+        )
+
+        genre = Genre.objects.exclude(title=titles[1]['id']).first()
+        before = Title.objects.get(pk=titles[1]['id']).modified
+        genre.title_set.add(titles[1]['id'])
+        assert Title.objects.get(pk=titles[1]['id']).modified > before, (
+            'Проверьте, что добавление произведения к жанру со стороны жанра '
+            'обновляет `modified` произведения'
+        )
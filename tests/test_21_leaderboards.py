@@ -0,0 +1,73 @@
+import pytest
+
+
+def create_board(django_user_model):
+    from reviews.models import Category, Genre, Review, Title
+    category = Category.objects.create(name='Фильм', slug='films')
+    genre = Genre.objects.create(name='Драма', slug='drama')
+    titles = [
+        Title.objects.create(name=name, year=2000, category=category)
+        for name in ('Одна десятка', 'Много девяток', 'Без отзывов')
+    ]
+    for title in titles:
+        title.genre.add(genre)
+    users = [
+        django_user_model.objects.create_user(username=f'critic{i}', email=f'critic{i}@yamdb.fake')
+        for i in range(8)
+    ]
+    Review.objects.create(title=titles[0], author=users[0], text='Шедевр', score=10)
+    for user in users[:5]:
+        Review.objects.create(title=titles[1], author=user, text='Отлично', score=9)
+    return titles, users
+
+
+class Test21Leaderboards:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_weighted_order(self, client, django_user_model, django_assert_num_queries):
+        titles, _ = create_board(django_user_model)
+        for url in ('/api/v1/categories/films/top/', '/api/v1/genres/drama/top/'):
+            response = client.get(url)
+            assert response.status_code == 200, (
+                f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+            )
+            assert [entry['id'] for entry in response.json()] == [titles[1].id, titles[0].id], (
+                f'Проверьте, что `{url}` сортирует произведения по взвешенному рейтингу '
+                'и не включает произведения без оценок'
+            )
+            with django_assert_num_queries(0):
+                client.get(url)
+        entry = client.get('/api/v1/categories/films/top/').json()[1]
+        assert entry['rating'] == 10 and entry['weighted_rating'] == pytest.approx(6.25)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_refresh_on_review_change(self, client, django_user_model, django_assert_num_queries):
+        from reviews.models import Review
+        titles, users = create_board(django_user_model)
+        url = '/api/v1/genres/drama/top/'
+        client.get(url)
+        for user in users[1:]:
+            Review.objects.create(title=titles[0], author=user, text='Шедевр', score=10)
+        with django_assert_num_queries(0):
+            response = client.get(url)
+        assert [entry['id'] for entry in response.json()] == [titles[0].id, titles[1].id], (
+            'Проверьте, что лидерборд обновляется при добавлении отзывов'
+        )
+        Review.objects.filter(title=titles[1]).delete()
+        assert [entry['id'] for entry in client.get(url).json()] == [titles[0].id], (
+            'Проверьте, что лидерборд обновляется при удалении отзывов'
+        )
+        titles[0].delete()
+        assert client.get(url).json() == [], (
+            'Проверьте, что удалённое произведение пропадает из лидерборда'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_leaderboard_size(self, client, django_user_model, settings):
+        settings.LEADERBOARD_SIZE = 1
+        titles, _ = create_board(django_user_model)
+        assert len(client.get('/api/v1/categories/films/top/').json()) == 1
+        response = client.get('/api/v1/categories/unknown/top/')
+        assert response.status_code == 404, (
+            'Проверьте, что лидерборд несуществующей категории возвращает статус 404'
+        )
@@ -0,0 +1,81 @@
+import pytest
+
+
+def create_discussions(django_user_model):
+    from reviews.models import Category, Comment, Review, Title
+    category = Category.objects.create(name='Фильм', slug='films')
+    titles = [
+        Title.objects.create(name=f'Произведение {i}', year=2000, category=category)
+        for i in range(3)
+    ]
+    users = [
+        django_user_model.objects.create_user(username=f'critic{i}', email=f'critic{i}@yamdb.fake')
+        for i in range(5)
+    ]
+    for title in titles:
+        for user in users:
+            review = Review.objects.create(title=title, author=user, text='Отзыв', score=7)
+            Comment.objects.bulk_create(
+                Comment(review=review, author=author, text='Комментарий') for author in users
+            )
+    return titles
+
+
+class Test22Include:
+
+    @pytest.fixture(autouse=True)
+    def limits(self, settings):
+        settings.INCLUDED_REVIEWS_PER_TITLE = 3
+        settings.INCLUDED_COMMENTS_PER_REVIEW = 2
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_detail_include(self, client, django_user_model, django_assert_num_queries):
+        titles = create_discussions(django_user_model)
+        url = f'/api/v1/titles/{titles[0].id}/'
+        assert 'reviews' not in client.get(url).json()
+        # дата изменения для ETag, произведение, жанры, отзывы, комментарии
+        with django_assert_num_queries(5):
+            response = client.get(f'{url}?include=reviews.comments')
+        assert response.status_code == 200
+        reviews = response.json()['reviews']
+        assert len(reviews) == 3, (
+            'Проверьте, что `?include=reviews` отдаёт ограниченное число отзывов произведения'
+        )
+        latest = titles[0].reviews.order_by('-pub_date', 'id').values_list('id', flat=True)[:3]
+        assert [review['id'] for review in reviews] == list(latest)
+        assert all(len(review['comments']) == 2 for review in reviews), (
+            'Проверьте, что `?include=reviews.comments` отдаёт ограниченное число комментариев отзыва'
+        )
+        response = client.get(f'{url}?include=authors')
+        assert response.status_code == 400, (
+            'Проверьте, что неизвестная связь в `include` возвращает статус 400'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_list_include(self, client, django_user_model, django_assert_num_queries):
+        create_discussions(django_user_model)
+        for _ in range(2):
+            # COUNT, произведения, жанры, отзывы, комментарии — без кэша
+            with django_assert_num_queries(5):
+                response = client.get('/api/v1/titles/?include=reviews,reviews.comments')
+        results = response.json()['results']
+        assert len(results) == 3
+        assert all(
+            len(title['reviews']) == 3 and title['reviews'][0]['comments']
+            for title in results
+        ), 'Проверьте, что `?include=` работает и для списка произведений'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_review_include(self, client, django_user_model, django_assert_num_queries):
+        titles = create_discussions(django_user_model)
+        url = f'/api/v1/titles/{titles[0].id}/reviews/'
+        # произведение, COUNT, отзывы с авторами, комментарии с авторами
+        with django_assert_num_queries(4):
+            response = client.get(f'{url}?include=comments')
+        assert all(len(review['comments']) == 2 for review in response.json()['results']), (
+            f'Проверьте, что `{url}?include=comments` отдаёт комментарии отзывов'
+        )
+        review = response.json()['results'][0]
+        response = client.get(f'{url}{review["id"]}/?include=comments')
+        assert response.json()['comments'] == review['comments']
+        assert client.get(f'{url}?include=reviews').status_code == 400
@@ -0,0 +1,68 @@
+import pytest
+
+from .test_09_title_queries import create_catalogue
+
+
+class Test23SparseFields:
+
+    @pytest.mark.parametrize('fields, queries, joined', (
+        ('id,name,year', 2, False),
+        ('id,category', 2, True),
+        ('id,genre', 3, False),
+    ))
+    @pytest.mark.django_db(transaction=True)
+    def test_01_title_list_fields(self, client, django_assert_num_queries, fields, queries, joined):
+        create_catalogue(20)
+        with django_assert_num_queries(queries) as context:
+            response = client.get(f'/api/v1/titles/?fields={fields}')
+        assert response.status_code == 200
+        assert set(response.json()['results'][0]) == set(fields.split(',')), (
+            'Проверьте, что `?fields=` оставляет в ответе только запрошенные поля'
+        )
+        titles_sql = context.captured_queries[-queries + 1]['sql']
+        assert '"description"' not in titles_sql, (
+            'Проверьте, что `?fields=` не загружает колонки незапрошенных полей'
+        )
+        assert ('JOIN "reviews_category"' in titles_sql) == joined, (
+            'Проверьте, что категория присоединяется, только если она запрошена'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_title_detail_fields(self, client, django_assert_num_queries):
+        title = create_catalogue(5)
+        url = f'/api/v1/titles/{title.id}/'
+        # дата изменения для ETag, произведение
+        with django_assert_num_queries(2):
+            response = client.get(f'{url}?fields=id,name')
+        assert response.json() == {'id': title.id, 'name': title.name}
+        response = client.get(f'{url}?fields=id,rating&include=reviews')
+        assert set(response.json()) == {'id', 'rating', 'reviews'}
+        response = client.get(f'{url}?fields=id,secret')
+        assert response.status_code == 400, (
+            'Проверьте, что неизвестное поле в `fields` возвращает статус 400'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_other_resources(self, client, admin_client, django_user_model, django_assert_num_queries):
+        from reviews.models import Comment, Review
+        title = create_catalogue(5)
+        users = [
+            django_user_model.objects.create_user(username=f'critic{i}', email=f'critic{i}@yamdb.fake')
+            for i in range(3)
+        ]
+        for user in users:
+            review = Review.objects.create(title=title, author=user, text='Отзыв', score=5)
+            Comment.objects.create(review=review, author=user, text='Комментарий')
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        response = client.get(f'{url}?fields=id,author')
+        assert response.json()['results'][0].keys() == {'id', 'author'}
+        # произведение, отзывы — без COUNT и без дозагрузки полей курсора
+        with django_assert_num_queries(2):
+            response = client.get(f'{url}?fields=id,score&cursor=')
+        assert response.json()['next'] is None and len(response.json()['results']) == 3
+        response = client.get(f'{url}{review.id}/comments/?fields=text')
+        assert response.json()['results'] == [{'text': 'Комментарий'}]
+        response = client.get('/api/v1/categories/?fields=slug')
+        assert response.json()['results'] == [{'slug': 'films'}]
+        response = admin_client.get('/api/v1/users/?fields=username')
+        assert set(response.json()['results'][0]) == {'username'}
@@ -0,0 +1,117 @@
+import re
+
+import pytest
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+
+from .test_09_title_queries import create_catalogue
+
+FULL_SCAN = re.compile(
+    r'^SCAN (TABLE )?(?P<table>\w+)( AS \w+)?'
+    r'(?P<index> USING (COVERING )?INDEX \w+)?$'
+)
+
+
+def full_scans(sql, allow_index_scan=True):
+    """
+    Шаги плана, читающие таблицу целиком. Проход по индексу ради
+    порядка (список с LIMIT, COUNT) допустим, если allow_index_scan.
+    """
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        details = [row[-1] for row in cursor.fetchall()]
+    scans = []
+    for detail in details:
+        match = FULL_SCAN.match(detail)
+        if not match or (match['index'] and allow_index_scan):
+            continue
+        # U0, U1… — псевдонимы таблиц в подзапросах Django
+        if match['table'] in tables or re.fullmatch(r'U\d+', match['table']):
+            scans.append(detail)
+    return scans
+
+
+def queryset_sql(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        return connection.ops.last_executed_query(cursor, sql, params)
+
+
+@pytest.fixture
+def catalogue(django_user_model):
+    from reviews.models import Comment, Review
+    title = create_catalogue(30)
+    user = django_user_model.objects.create_user(username='critic', email='critic@yamdb.fake')
+    review = Review.objects.create(title=title, author=user, text='Отзыв', score=5)
+    Comment.objects.create(review=review, author=user, text='Комментарий')
+    return title, review
+
+
+class Test24QueryPlans:
+
+    @pytest.mark.parametrize('url', (
+        '/api/v1/titles/',
+        '/api/v1/titles/?cursor=',
+        '/api/v1/titles/?genre=horror',
+        '/api/v1/titles/?category=films',
+        '/api/v1/titles/?year=1905',
+        '/api/v1/titles/?search=Произведение',
+        '/api/v1/titles/?include=reviews.comments',
+        '/api/v1/titles/{title}/',
+        '/api/v1/titles/{title}/stats/',
+        '/api/v1/titles/{title}/reviews/',
+        '/api/v1/titles/{title}/reviews/?cursor=',
+        '/api/v1/titles/{title}/reviews/{review}/',
+        '/api/v1/titles/{title}/reviews/{review}/comments/',
+        '/api/v1/categories/',
+        '/api/v1/genres/',
+        '/api/v1/categories/films/top/',
+        '/api/v1/genres/horror/top/',
+        '/api/v1/users/',
+    ))
+    @pytest.mark.django_db(transaction=True)
+    def test_01_endpoint_plans(self, admin_client, catalogue, url):
+        title, review = catalogue
+        url = url.format(title=title.id, review=review.id)
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.get(url)
+        assert response.status_code == 200
+        selects = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+        ]
+        assert selects
+        for sql in selects:
+            scans = full_scans(sql)
+            assert not scans, (
+                f'Проверьте индексы: запрос `{url}` читает таблицу целиком ({scans}):\n{sql}'
+            )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_role_and_cascade_plans(self, catalogue):
+        from reviews.models import Comment, GenreTitle, Review, User
+        title, review = catalogue
+        querysets = (
+            User.objects.filter(role='admin'),
+            Review.objects.filter(author=review.author_id),
+            Review.objects.filter(title=title),
+            Comment.objects.filter(review=review),
+            Comment.objects.filter(author=review.author_id),
+            GenreTitle.objects.filter(title=title),
+        )
+        for queryset in querysets:
+            sql = queryset_sql(queryset)
+            assert not full_scans(sql, allow_index_scan=False), (
+                f'Проверьте индексы для запроса:\n{sql}'
+            )
+        sql = queryset_sql(User.objects.filter(bio=''))
+        assert full_scans(sql, allow_index_scan=False)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_unique_genre_title(self, catalogue):
+        from reviews.models import GenreTitle
+        title, _ = catalogue
+        pair = GenreTitle.objects.filter(title=title).first()
+        with pytest.raises(IntegrityError):
+            GenreTitle.objects.create(genre_id=pair.genre_id, title=title)
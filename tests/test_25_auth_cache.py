@@ -0,0 +1,118 @@
+import csv
+import shutil
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import auth_cache, auth_user_cache_key
+
+from .common import auth_client
+from .test_14_csv_load import DATA_DIR
+
+
+def user_queries(context):
+    return [query for query in context.captured_queries if 'FROM "reviews_user"' in query['sql']]
+
+
+class Test25AuthCache:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_user_cached_between_requests(self, user):
+        client = auth_client(user)
+        client.get('/api/v1/categories/')
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/api/v1/categories/')
+        assert response.status_code == 200
+        assert not user_queries(context), (
+            'Проверьте, что аутентификация по JWT не запрашивает пользователя из БД '
+            'на каждый запрос'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_role_change_and_delete(self, admin_client, user):
+        client = auth_client(user)
+        assert client.get('/api/v1/users/').status_code == 403
+        admin_client.patch(f'/api/v1/users/{user.username}/', data={'role': 'admin'})
+        assert client.get('/api/v1/users/').status_code == 200, (
+            'Проверьте, что смена роли пользователя применяется сразу, без ожидания кэша'
+        )
+        admin_client.patch(f'/api/v1/users/{user.username}/', data={'role': 'user'})
+        assert client.get('/api/v1/users/').status_code == 403
+        admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert client.get('/api/v1/users/me/').status_code == 401, (
+            'Проверьте, что токен удалённого пользователя сразу перестаёт действовать'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_settings_change_resets_cache(self, user):
+        client = auth_client(user)
+        client.get('/api/v1/users/me/')
+        client.patch('/api/v1/users/me/', data={'bio': 'Новая биография'})
+        with CaptureQueriesContext(connection) as context:
+            client.get('/api/v1/categories/')
+        assert user_queries(context), (
+            'Проверьте, что изменение профиля через `/api/v1/users/me/` сбрасывает кэш пользователя'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_cached_user_save_keeps_password(self, user):
+        from rest_framework_simplejwt.tokens import AccessToken
+        from api.authentication import CachedJWTAuthentication
+        cached = CachedJWTAuthentication().get_user(AccessToken.for_user(user))
+        assert (cached.pk, cached.role) == (user.pk, user.role)
+        cached.save()
+        user.refresh_from_db()
+        assert user.check_password('1234567'), (
+            'Проверьте, что сохранение пользователя из кэша не затирает незагруженные поля'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_role_change_in_transaction(self, user):
+        client = auth_client(user)
+        assert client.get('/api/v1/users/').status_code == 403
+        key = auth_user_cache_key(user.pk)
+        stale = auth_cache().get(key)
+        with transaction.atomic():
+            user.role = 'admin'
+            user.save()
+            # Параллельный запрос до коммита видит и кэширует старую строку.
+            auth_cache().set(key, stale)
+        assert client.get('/api/v1/users/').status_code == 200, (
+            'Проверьте, что закэшированный пользователь сбрасывается после коммита'
+        )
+
+    def test_06_auth_cache_shared(self):
+        assert 'locmem' not in settings.CACHES['auth']['BACKEND'], (
+            'Проверьте, что кэш пользователей по умолчанию общий для воркеров, '
+            'а не в памяти процесса'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_07_csv_load_resets_cache(self, tmp_path):
+        from rest_framework_simplejwt.tokens import AccessToken
+        from api.authentication import CachedJWTAuthentication
+        from reviews.models import User
+        data_dir = tmp_path / 'data'
+        shutil.copytree(DATA_DIR, data_dir)
+        call_command('csv_load', '--incremental', '--data-dir', str(data_dir))
+        user = User.objects.get(role='user', pk=100)
+        token = AccessToken.for_user(user)
+        assert CachedJWTAuthentication().get_user(token).role == 'user'
+
+        path = data_dir / 'users.csv'
+        with open(path, encoding='utf-8-sig') as file:
+            rows = list(csv.DictReader(file))
+        for row in rows:
+            if row['id'] == '100':
+                row['role'] = 'admin'
+        with open(path, 'w', encoding='utf-8-sig', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        call_command('csv_load', '--incremental', '--data-dir', str(data_dir))
+        assert CachedJWTAuthentication().get_user(token).role == 'admin', (
+            'Проверьте, что `csv_load --incremental` сбрасывает кэш пользователей'
+        )
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+from django.core.management import call_command
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import verified_tokens
+
+from .common import auth_client
+
+
+@pytest.fixture
+def verifications(monkeypatch):
+    calls = []
+    original = JWTAuthentication.get_validated_token
+
+    def counting(self, raw_token):
+        calls.append(raw_token)
+        return original(self, raw_token)
+
+    verified_tokens.clear()
+    monkeypatch.setattr(JWTAuthentication, 'get_validated_token', counting)
+    yield calls
+    verified_tokens.clear()
+
+
+class Test26VerifiedTokens:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_token_verified_once(self, user, verifications):
+        client = auth_client(user)
+        for _ in range(3):
+            assert client.get('/api/v1/users/me/').status_code == 200
+        assert len(verifications) == 1, (
+            'Проверьте, что подпись повторно присланного токена не проверяется заново'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_expired_entry_verified_again(self, user, verifications):
+        client = auth_client(user)
+        assert client.get('/api/v1/users/me/').status_code == 200
+        for key, (token, expires) in list(verified_tokens.tokens.items()):
+            verified_tokens.tokens[key] = (token, time.time() - 1)
+        assert client.get('/api/v1/users/me/').status_code == 200
+        assert len(verifications) == 2, (
+            'Проверьте, что запись с истёкшим exp не берётся из кэша проверенных токенов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_lru_eviction(self, settings, user, admin, verifications):
+        settings.VERIFIED_TOKEN_CACHE_SIZE = 2
+        tokens = [str(AccessToken.for_user(account)) for account in (user, admin, user)]
+        for token in tokens:
+            verified_tokens.set(token, AccessToken(token))
+        assert len(verified_tokens.tokens) == 2
+        assert verified_tokens.get(tokens[0]) is None, (
+            'Проверьте, что при переполнении кэша вытесняется самый старый токен'
+        )
+        assert verified_tokens.get(tokens[2]) is not None
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_disabled(self, settings, user, verifications):
+        settings.VERIFIED_TOKEN_CACHE_SIZE = 0
+        client = auth_client(user)
+        client.get('/api/v1/users/me/')
+        client.get('/api/v1/users/me/')
+        assert len(verifications) == 2, (
+            'Проверьте, что VERIFIED_TOKEN_CACHE_SIZE = 0 отключает кэш проверенных токенов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_benchmark_command(self, user, capsys):
+        call_command('benchmark_auth', iterations=20)
+        output = capsys.readouterr().out
+        assert 'без кэша токенов' in output and 'с кэшем токенов' in output
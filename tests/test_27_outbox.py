@@ -0,0 +1,139 @@
+import datetime as dt
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+from reviews.models import OutboxEmail
+
+SIGNUP = {'username': 'outbox_user', 'email': 'outbox@yamdb.fake'}
+
+
+@pytest.fixture
+def outbox(settings):
+    settings.EMAIL_OUTBOX = True
+    settings.EMAIL_OUTBOX_MAX_ATTEMPTS = 2
+
+
+@pytest.fixture
+def broken_mail(monkeypatch):
+    def fail(self, *args, **kwargs):
+        raise ConnectionRefusedError('почтовый сервер недоступен')
+
+    monkeypatch.setattr('django.core.mail.EmailMessage.send', fail)
+
+
+class Test27Outbox:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_signup_queues_mail(self, client, outbox):
+        before = len(mail.outbox)
+        response = client.post('/api/v1/auth/signup/', data=SIGNUP)
+        assert response.status_code == 200
+        assert len(mail.outbox) == before, (
+            'Проверьте, что при EMAIL_OUTBOX регистрация не отправляет письмо в запросе'
+        )
+        assert OutboxEmail.objects.filter(to=SIGNUP['email']).count() == 1, (
+            'Проверьте, что при EMAIL_OUTBOX письмо с кодом попадает в таблицу исходящих'
+        )
+        call_command('send_outbox')
+        assert len(mail.outbox) == before + 1
+        assert mail.outbox[-1].to == [SIGNUP['email']]
+        assert not OutboxEmail.objects.exists(), (
+            'Проверьте, что отправленные письма удаляются из таблицы исходящих'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_failed_signup_queues_nothing(self, client, outbox, user):
+        response = client.post(
+            '/api/v1/auth/signup/',
+            data={'username': 'other', 'email': user.email})
+        assert response.status_code == 400
+        assert not OutboxEmail.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_retry_with_backoff(self, client, outbox, broken_mail):
+        client.post('/api/v1/auth/signup/', data=SIGNUP)
+        call_command('send_outbox')
+        email = OutboxEmail.objects.get()
+        assert email.attempts == 1
+        assert 'ConnectionRefusedError' in email.last_error
+        assert email.next_attempt > timezone.now(), (
+            'Проверьте, что повторная отправка откладывается после ошибки'
+        )
+        call_command('send_outbox')
+        assert OutboxEmail.objects.get().attempts == 1, (
+            'Проверьте, что письмо не отправляется повторно раньше срока'
+        )
+        OutboxEmail.objects.update(next_attempt=timezone.now())
+        call_command('send_outbox')
+        email = OutboxEmail.objects.get()
+        assert email.attempts == 2
+        assert (email.next_attempt - timezone.now()) > dt.timedelta(seconds=60), (
+            'Проверьте, что пауза между попытками растёт'
+        )
+        OutboxEmail.objects.update(next_attempt=timezone.now())
+        call_command('send_outbox')
+        assert OutboxEmail.objects.get().attempts == 2, (
+            'Проверьте, что после EMAIL_OUTBOX_MAX_ATTEMPTS попыток письмо больше не отправляется'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_batches(self, outbox):
+        OutboxEmail.objects.bulk_create(
+            OutboxEmail(subject='s', body='b', from_email='yamdb@example.com',
+                        to=f'user{number}@yamdb.fake')
+            for number in range(5)
+        )
+        before = len(mail.outbox)
+        call_command('send_outbox', batch_size=2)
+        assert len(mail.outbox) == before + 5
+        assert not OutboxEmail.objects.exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_sync_mail_sent_after_commit(self, client, monkeypatch):
+        in_transaction = []
+
+        def send_messages(self, messages):
+            in_transaction.append(connection.in_atomic_block)
+            return len(messages)
+
+        monkeypatch.setattr(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages)
+        response = client.post('/api/v1/auth/signup/', data=SIGNUP)
+        assert response.status_code == 200
+        assert in_transaction == [False], (
+            'Проверьте, что без EMAIL_OUTBOX письмо отправляется после коммита, '
+            'а не внутри транзакции регистрации'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_claimed_mail_not_sent_twice(self, client, outbox, monkeypatch):
+        from api.management.commands.send_outbox import claim_batch
+
+        client.post('/api/v1/auth/signup/', data=SIGNUP)
+        claimed = claim_batch(10)
+        assert len(claimed) == 1
+        before = len(mail.outbox)
+        call_command('send_outbox')
+        assert len(mail.outbox) == before, (
+            'Проверьте, что письмо, взятое другим воркером, не отправляется повторно'
+        )
+        assert claim_batch(10) == []
+
+        OutboxEmail.objects.update(next_attempt=timezone.now())
+        in_transaction = []
+
+        def send_messages(self, messages):
+            in_transaction.append(connection.in_atomic_block)
+            return len(messages)
+
+        monkeypatch.setattr(
+            'django.core.mail.backends.locmem.EmailBackend.send_messages', send_messages)
+        call_command('send_outbox')
+        assert in_transaction == [False], (
+            'Проверьте, что письмо с истёкшей арендой отправляется вне транзакции'
+        )
+        assert not OutboxEmail.objects.exists()
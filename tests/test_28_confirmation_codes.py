@@ -0,0 +1,82 @@
+import re
+
+import pytest
+from django.core import mail
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.utils import send_confirm_mail
+from reviews.models import User
+
+SIGNUP = {'username': 'signed_user', 'email': 'signed@yamdb.fake'}
+
+
+@pytest.fixture
+def signed_codes(settings):
+    settings.SIGNED_CONFIRMATION_CODES = True
+    settings.EMAIL_OUTBOX = False
+
+
+def writes(context):
+    return [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+def signup_code(client):
+    response = client.post('/api/v1/auth/signup/', data=SIGNUP)
+    assert response.status_code == 200
+    return mail.outbox[-1].body
+
+
+def exchange(client, code):
+    return client.post('/api/v1/auth/token/', data={
+        'username': SIGNUP['username'], 'confirmation_code': code})
+
+
+class Test28ConfirmationCodes:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_code_is_signature(self, client, signed_codes):
+        code = signup_code(client)
+        user = User.objects.get(username=SIGNUP['username'])
+        assert user.confirmation_code not in code, (
+            'Проверьте, что при SIGNED_CONFIRMATION_CODES в письме подпись, а не значение из БД'
+        )
+        assert exchange(client, code).status_code == 200
+        assert exchange(client, code).status_code == 400, (
+            'Проверьте, что код подтверждения одноразовый'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_new_code_writes_nothing(self, client, signed_codes):
+        signup_code(client)
+        user = User.objects.get(username=SIGNUP['username'])
+        with CaptureQueriesContext(connection) as context:
+            send_confirm_mail(user)
+        assert not writes(context), (
+            'Проверьте, что новый код при SIGNED_CONFIRMATION_CODES не пишется в БД'
+        )
+        assert exchange(client, mail.outbox[-1].body).status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_exchange_updates_one_column(self, client, signed_codes):
+        code = signup_code(client)
+        with CaptureQueriesContext(connection) as context:
+            assert exchange(client, code).status_code == 200
+        updates = writes(context)
+        assert len(updates) == 1 and re.match(
+            r'UPDATE "reviews_user" SET "confirmation_code" = \S+ WHERE', updates[0]), (
+            'Проверьте, что обмен кода на токен обновляет только confirmation_code'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_expired_and_forged(self, client, settings, signed_codes):
+        code = signup_code(client)
+        assert exchange(client, code[:-1] + ('A' if code[-1] != 'A' else 'B')).status_code == 400
+        assert exchange(client, 12345).status_code == 400
+        settings.CONFIRMATION_CODE_MAX_AGE = -1
+        assert exchange(client, code).status_code == 400, (
+            'Проверьте, что просроченный код подтверждения не принимается'
+        )
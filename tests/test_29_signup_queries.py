@@ -0,0 +1,92 @@
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+
+from api.serializers import UserRegistrationSerializer
+from reviews.models import User
+
+URL = '/api/v1/auth/signup/'
+SIGNUP = {'username': 'burst_user', 'email': 'burst@yamdb.fake'}
+
+
+def statements(context):
+    return [
+        query['sql'] for query in context.captured_queries
+        if query['sql'].startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE'))
+    ]
+
+
+class Test29SignupQueries:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_01_signup_two_queries(self, client):
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(URL, data=SIGNUP)
+        assert response.status_code == 200
+        queries = statements(context)
+        assert len(queries) == 2, (
+            'Проверьте, что регистрация делает один SELECT по username или email '
+            f'и один INSERT, а не {len(queries)} запросов: {queries}'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_02_repeat_signup_resends_code(self, client):
+        client.post(URL, data=SIGNUP)
+        code = User.objects.get(username=SIGNUP['username']).confirmation_code
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(URL, data=SIGNUP)
+        assert response.status_code == 200, (
+            'Проверьте, что повторная регистрация с теми же username и email '
+            'возвращает статус 200'
+        )
+        assert len(statements(context)) == 1
+        assert mail.outbox[-1].body == code
+
+    @pytest.mark.django_db(transaction=True)
+    def test_03_user_created_by_admin(self, client, admin_client):
+        admin_client.post('/api/v1/users/', data=SIGNUP)
+        response = client.post(URL, data=SIGNUP)
+        assert response.status_code == 200, (
+            'Проверьте, что пользователь, созданный админом, может получить код'
+        )
+        code = mail.outbox[-1].body
+        assert code and User.objects.get(username=SIGNUP['username']).confirmation_code == code
+        response = client.post('/api/v1/auth/token/', data={
+            'username': SIGNUP['username'], 'confirmation_code': code})
+        assert response.status_code == 200
+
+    @pytest.mark.django_db(transaction=True)
+    def test_04_race_rejected_by_constraint(self):
+        serializer = UserRegistrationSerializer(data={
+            'username': 'racer', 'email': 'racer@yamdb.fake'})
+        assert serializer.is_valid()
+        User.objects.create(username='other_racer', email='racer@yamdb.fake')
+        with pytest.raises(ValidationError):
+            serializer.save()
+        assert User.objects.filter(email='racer@yamdb.fake').count() == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_05_benchmark_command(self, capsys):
+        call_command('benchmark_signup', signups=6, threads=1, unique=3)
+        output = capsys.readouterr().out
+        assert '200 × 6' in output
+        assert 'Создано пользователей: 3 из 3' in output
+        assert not User.objects.filter(username__startswith='benchmark_signup_').exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_06_concurrent_identical_signups(self):
+        first, second = (
+            UserRegistrationSerializer(data=SIGNUP) for _ in range(2))
+        assert first.is_valid() and second.is_valid()
+        sent = len(mail.outbox)
+        first.save()
+        second.save()
+        assert User.objects.filter(username=SIGNUP['username']).count() == 1
+        assert len(mail.outbox) == sent + 2, (
+            'Проверьте, что проигравшая гонку регистрация с той же парой '
+            'username и email считается повторным запросом кода'
+        )
+        assert mail.outbox[-1].body == mail.outbox[-2].body